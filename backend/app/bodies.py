@@ -0,0 +1,80 @@
+"""
+Compressed email body storage.
+
+Bodies live in `email_bodies` (see migrations/010_move_email_bodies.py),
+deflate-compressed, so the `emails` rows scanned by list queries stay small.
+New emails are inserted with their body in `emails.body` as before, so the
+search index triggers see it, then `move_bodies` moves it out in the same
+transaction, leaving `emails.body` empty. Body edits go through
+`update_body`.
+"""
+
+import os
+import zlib
+
+BODY_COMPRESSION_LEVEL = int(os.getenv("BODY_COMPRESSION_LEVEL", "6"))
+
+CODEC_RAW = 0  # UTF-8 text, for bodies deflate cannot shrink
+CODEC_DEFLATE = 1  # raw deflate (no zlib header) of the UTF-8 text
+
+# Full email rows: emails joined with their stored body
+EMAIL_COLUMNS = "emails.*, email_bodies.codec AS body_codec, email_bodies.data AS body_data"
+EMAIL_TABLES = "emails LEFT JOIN email_bodies ON email_bodies.email_id = emails.id"
+
+
+def encode_body(body: str) -> tuple[int, bytes]:
+    data = body.encode()
+    compressed = zlib.compress(data, BODY_COMPRESSION_LEVEL, wbits=-15)
+    if len(compressed) < len(data):
+        return CODEC_DEFLATE, compressed
+    return CODEC_RAW, data
+
+
+def decode_body(codec: int, data: bytes) -> str:
+    if codec == CODEC_DEFLATE:
+        return zlib.decompress(data, wbits=-15).decode()
+    return bytes(data).decode()
+
+
+def row_body(row) -> str:
+    """Body of a row selected with EMAIL_COLUMNS (rows not yet moved by the
+    migration still hold it in `emails.body`)."""
+    if row["body_data"] is None:
+        return row["body"]
+    return decode_body(row["body_codec"], row["body_data"])
+
+
+def move_bodies(cursor, where: str, params: tuple = ()) -> int:
+    """Move the bodies of the emails matching `where` that have no stored
+    body yet into email_bodies. Returns how many were moved."""
+    cursor.execute(
+        f"""SELECT id, body FROM emails WHERE ({where})
+            AND NOT EXISTS (SELECT 1 FROM email_bodies WHERE email_id = emails.id)""",
+        params,
+    )
+    rows = [(email_id, *encode_body(body)) for email_id, body in cursor.fetchall()]
+    if not rows:
+        return 0
+    cursor.executemany(
+        "INSERT INTO email_bodies (email_id, codec, data) VALUES (?, ?, ?)", rows
+    )
+    cursor.execute(f"UPDATE emails SET body = '' WHERE ({where}) AND body <> ''", params)
+    return len(rows)
+
+
+def update_body(cursor, email_id: str, body: str) -> None:
+    """Replace a stored body, re-indexing it for search.
+
+    The email_bodies update trigger logs the change and bumps the version.
+    """
+    move_bodies(cursor, "id = ?", (email_id,))
+    codec, data = encode_body(body)
+    cursor.execute(
+        "UPDATE email_bodies SET codec = ?, data = ? WHERE email_id = ?",
+        (codec, data, email_id),
+    )
+    cursor.execute(
+        "UPDATE emails_fts SET body = ? WHERE rowid = (SELECT rowid FROM emails WHERE id = ?)",
+        (body, email_id),
+    )
+
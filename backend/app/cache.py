@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, NamedTuple, Optional
+
+EMAIL_CACHE_MAX_BYTES = int(os.getenv("EMAIL_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+EMAIL_CACHE_TTL = float(os.getenv("EMAIL_CACHE_TTL", "60"))  # seconds, 0 = no expiry
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: Optional[str] = None
+
+
+class ResponseCache:
+    """In-process LRU + TTL cache of serialized JSON responses.
+
+    Entries are response bodies (plus their ETag) bounded by total body size
+    (`max_bytes`) and carry tags such
+    as ``email:<id>`` or ``filter:unread`` so writes can drop exactly the
+    entries they affect. An entry can also hold encoded variants of its body
+    (e.g. gzip), which count towards its size and are dropped with it. Safe
+    to use from the event loop and executor threads.
+    """
+
+    def __init__(self, max_bytes: int = EMAIL_CACHE_MAX_BYTES, ttl: float = EMAIL_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict[
+            str, tuple[CachedResponse, float, frozenset, dict[str, CachedResponse]]
+        ] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+        self.size = 0
+        # Bumped on every invalidation; lets a reader detect that a write raced
+        # its query and skip caching a possibly stale result.
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, _, _ = entry
+            if expires_at and expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(
+        self,
+        key: str,
+        value: CachedResponse,
+        tags: Iterable[str] = (),
+        generation: Optional[int] = None,
+    ) -> None:
+        """Store `value` unless it is too large or an invalidation happened
+        since `generation` was read."""
+        if len(value.body) > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            tags = frozenset(tags)
+            self._entries[key] = (value, expires_at, tags, {})
+            self.size += len(value.body)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_variant(self, key: str, encoding: str) -> Optional[CachedResponse]:
+        """The `encoding` variant of entry `key`, if one was stored."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[3].get(encoding) if entry is not None else None
+
+    def put_variant(
+        self, key: str, encoding: str, value: CachedResponse, generation: Optional[int] = None
+    ) -> None:
+        """Attach an encoded variant to entry `key` if it is still cached and
+        no invalidation happened since `generation` was read."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (generation is not None and generation != self.generation):
+                return
+            variants = entry[3]
+            if encoding in variants:
+                return
+            variants[encoding] = value
+            self.size += len(value.body)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, *tags: str) -> None:
+        """Drop every entry carrying any of `tags`."""
+        with self._lock:
+            self.generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._tags.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key: str) -> None:
+        value, _, tags, variants = self._entries.pop(key)
+        self.size -= len(value.body) + sum(len(v.body) for v in variants.values())
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+email_cache = ResponseCache()
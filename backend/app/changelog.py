@@ -0,0 +1,54 @@
+"""
+Email change-log retention.
+
+Every email write appends to `email_changes` (see migrations/009); the log
+feeds GET /emails/changes and event replay. `prune_changes` trims each
+mailbox's log to its newest EMAIL_CHANGES_RETENTION entries, and
+`change_horizon` tells readers which cursors can no longer be served.
+"""
+
+import os
+
+from app.database import get_db
+
+# Change-log entries kept per mailbox; older ones are pruned, and clients
+# asking for changes from before them get 410 and must reload
+EMAIL_CHANGES_RETENTION = int(os.getenv("EMAIL_CHANGES_RETENTION", "100000"))
+EMAIL_CHANGES_PRUNE_INTERVAL = float(os.getenv("EMAIL_CHANGES_PRUNE_INTERVAL", "60"))  # s
+PRUNE_BATCH_SIZE = 5000  # entries deleted per transaction
+
+
+def latest_change_seq(cursor) -> int:
+    """Seq of the latest email_changes entry (0 before the first change)."""
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'email_changes'")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def change_horizon(cursor) -> int:
+    """Highest seq pruned from the change log (0 if none): every change
+    after it is still logged, so `since` values below it cannot be served."""
+    cursor.execute("SELECT min(seq) FROM email_changes")
+    first = cursor.fetchone()[0]
+    # Seqs have no gaps (AUTOINCREMENT, rolled back with the transaction)
+    return first - 1 if first is not None else latest_change_seq(cursor)
+
+
+def prune_changes(mailbox_id: str) -> int:
+    """Delete the mailbox's change-log entries older than the newest
+    EMAIL_CHANGES_RETENTION, PRUNE_BATCH_SIZE per transaction so writers
+    are not held up. Returns how many were deleted."""
+    deleted = 0
+    while True:
+        with get_db(mailbox_id) as conn:
+            cursor = conn.cursor()
+            cutoff = latest_change_seq(cursor) - EMAIL_CHANGES_RETENTION
+            cursor.execute("SELECT min(seq) FROM email_changes")
+            first = cursor.fetchone()[0]
+            if first is None or first > cutoff:
+                return deleted
+            cursor.execute(
+                "DELETE FROM email_changes WHERE seq <= ?",
+                (min(cutoff, first + PRUNE_BATCH_SIZE - 1),),
+            )
+            deleted += cursor.rowcount
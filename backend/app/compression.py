@@ -0,0 +1,172 @@
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional; responses fall back to gzip
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # bytes
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+# Encodings offered, in order of preference; empty disables compression
+COMPRESSION_ENCODINGS = [
+    encoding.strip()
+    for encoding in os.getenv("COMPRESSION_ENCODINGS", "br,gzip").split(",")
+    if encoding.strip() in ("br", "gzip") and (encoding.strip() != "br" or brotli)
+]
+
+# Only text-like payloads are worth compressing
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+# Never buffered or re-encoded: SSE must reach the client event by event
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the preferred enabled encoding an Accept-Encoding header allows."""
+    if not accept_encoding or not COMPRESSION_ENCODINGS:
+        return None
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in COMPRESSION_ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compressible(content_type: Optional[str]) -> bool:
+    if not content_type or content_type.startswith(UNCOMPRESSED_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, wbits=31)  # 31 = gzip
+    return compressor.compress(body) + compressor.flush()
+
+
+class _StreamCompressor:
+    """Incremental compressor for streamed responses."""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(COMPRESSION_GZIP_LEVEL, wbits=31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """Compress text responses with brotli or gzip per Accept-Encoding.
+
+    Complete bodies under COMPRESSION_MIN_SIZE are sent as they are; streamed
+    bodies are compressed incrementally. Responses that already carry a
+    Content-Encoding (e.g. precompressed cached bodies) pass through.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self.app, encoding)(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: str):
+        self.app = app
+        self.encoding = encoding
+        self.send: Send
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[_StreamCompressor] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            # Range-capable responses (attachment downloads) keep their raw
+            # bytes: their strong ETag and byte ranges refer to those bytes
+            self.passthrough = (
+                "content-encoding" in headers
+                or "accept-ranges" in headers
+                or "content-range" in headers
+                or message["status"] in (204, 206, 304)
+                or not compressible(headers.get("content-type"))
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start_message = message  # held until the first body chunk
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            if not more_body and len(body) < COMPRESSION_MIN_SIZE:
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body:
+                body = compress(body, self.encoding)
+                headers["Content-Length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            del headers["Content-Length"]
+            self.compressor = _StreamCompressor(self.encoding)
+            await self.send(start)
+
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.finish()
+        if chunk or not more_body:
+            await self.send(
+                {"type": "http.response.body", "body": chunk, "more_body": more_body}
+            )
@@ -1,22 +1,231 @@
+import asyncio
+import contextvars
+import functools
 import os
+import queue
+import re
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Generator
+from typing import Any, AsyncIterator, Callable, Generator, Iterator, Optional, TypeVar
+
+from app.metrics import (
+    METRICS_ENABLED,
+    InstrumentedConnection,
+    record_connect,
+    record_db_call,
+)
 
 DATABASE_PATH = os.getenv("DATABASE_PATH", "app.db")
 
+# Connection pool / pragma settings
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "8"))
+DATABASE_JOURNAL_MODE = os.getenv("DATABASE_JOURNAL_MODE", "WAL")
+DATABASE_SYNCHRONOUS = os.getenv("DATABASE_SYNCHRONOUS", "NORMAL")
+DATABASE_CACHE_SIZE = int(os.getenv("DATABASE_CACHE_SIZE", "-65536"))  # KiB when negative
+DATABASE_MMAP_SIZE = int(os.getenv("DATABASE_MMAP_SIZE", str(256 * 1024 * 1024)))
+DATABASE_BUSY_TIMEOUT = int(os.getenv("DATABASE_BUSY_TIMEOUT", "5000"))  # ms
+DATABASE_EXECUTOR_WORKERS = int(
+    os.getenv("DATABASE_EXECUTOR_WORKERS", str(DATABASE_POOL_SIZE))
+)
+
+# Mailbox shards: one SQLite file per mailbox, opened on first use
+DEFAULT_MAILBOX = "default"  # served from DATABASE_PATH
+DATABASE_SHARD_DIR = os.getenv(
+    "DATABASE_SHARD_DIR",
+    os.path.join(os.path.dirname(DATABASE_PATH) or ".", "mailboxes"),
+)
+DATABASE_SHARD_POOL_SIZE = int(os.getenv("DATABASE_SHARD_POOL_SIZE", "2"))
+DATABASE_SHARD_IDLE_TIMEOUT = float(os.getenv("DATABASE_SHARD_IDLE_TIMEOUT", "300"))  # s
+MAILBOX_ID_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+T = TypeVar("T")
 
-def get_connection() -> sqlite3.Connection:
+
+def get_connection(database_path: str = DATABASE_PATH) -> sqlite3.Connection:
     """Create a new database connection."""
-    conn = sqlite3.connect(DATABASE_PATH)
+    started = time.perf_counter()
+    conn = sqlite3.connect(
+        database_path,
+        timeout=DATABASE_BUSY_TIMEOUT / 1000,
+        check_same_thread=False,  # pooled connections move between worker threads
+        factory=InstrumentedConnection if METRICS_ENABLED else sqlite3.Connection,
+    )
     conn.row_factory = sqlite3.Row  # Enable dict-like access to rows
+    conn.execute(f"PRAGMA journal_mode = {DATABASE_JOURNAL_MODE}")
+    conn.execute(f"PRAGMA synchronous = {DATABASE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = {DATABASE_CACHE_SIZE}")
+    conn.execute(f"PRAGMA mmap_size = {DATABASE_MMAP_SIZE}")
+    conn.execute(f"PRAGMA busy_timeout = {DATABASE_BUSY_TIMEOUT}")
+    record_connect(time.perf_counter() - started)
     return conn
 
 
+class ConnectionPool:
+    """Thread-safe pool of long-lived SQLite connections to one database file.
+
+    Connections are created on demand and handed back after each request; up
+    to `size` idle connections are kept open so later requests reuse their
+    warm page cache instead of reconnecting.
+    """
+
+    def __init__(self, database_path: str = DATABASE_PATH, size: int = DATABASE_POOL_SIZE):
+        self.database_path = database_path
+        self.size = size
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.closed = False
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            self.in_use += 1
+            self.last_used = time.monotonic()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return get_connection(self.database_path)
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self.in_use -= 1
+            self.last_used = time.monotonic()
+        if conn.in_transaction:
+            conn.rollback()
+        if self.closed:
+            conn.close()
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self) -> None:
+        """Close every idle connection; borrowed ones close when released."""
+        self.closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    @property
+    def idle(self) -> int:
+        return self._idle.qsize()
+
+
+class ShardRouter:
+    """Routes each mailbox to its own SQLite file and connection pool.
+
+    The default mailbox lives in DATABASE_PATH; any other mailbox gets
+    ``<DATABASE_SHARD_DIR>/<mailbox_id>.db``, migrated and pooled on first
+    use, so writers to different mailboxes never contend on one lock. Only
+    routes that add data may reach a mailbox that does not exist yet (see
+    app/dependencies.py).
+    """
+
+    def __init__(
+        self,
+        default_pool: ConnectionPool,
+        shard_dir: str = DATABASE_SHARD_DIR,
+        idle_timeout: float = DATABASE_SHARD_IDLE_TIMEOUT,
+    ):
+        self.shard_dir = shard_dir
+        self.idle_timeout = idle_timeout
+        self._pools: dict[str, ConnectionPool] = {DEFAULT_MAILBOX: default_pool}
+        self._lock = threading.Lock()
+
+    def shard_path(self, mailbox_id: str) -> str:
+        if mailbox_id == DEFAULT_MAILBOX:
+            return self._pools[DEFAULT_MAILBOX].database_path
+        if not MAILBOX_ID_PATTERN.match(mailbox_id):
+            raise ValueError(f"Invalid mailbox id: {mailbox_id!r}")
+        return os.path.join(self.shard_dir, f"{mailbox_id}.db")
+
+    def is_open(self, mailbox_id: str) -> bool:
+        """Whether the mailbox's shard has an open pool (no disk access)."""
+        return mailbox_id in self._pools
+
+    def exists(self, mailbox_id: str) -> bool:
+        """Whether the mailbox's shard is open or has a database file."""
+        return mailbox_id in self._pools or os.path.exists(self.shard_path(mailbox_id))
+
+    def pool_for(self, mailbox_id: str) -> ConnectionPool:
+        pool = self._pools.get(mailbox_id)
+        if pool is not None:
+            return pool
+        with self._lock:
+            pool = self._pools.get(mailbox_id)
+            if pool is None:
+                from app.migrator import upgrade_database
+
+                path = self.shard_path(mailbox_id)
+                os.makedirs(self.shard_dir, exist_ok=True)
+                upgrade_database(path)
+                pool = ConnectionPool(path, DATABASE_SHARD_POOL_SIZE)
+                self._pools[mailbox_id] = pool
+            return pool
+
+    def close_idle(self) -> int:
+        """Close shard pools with nothing borrowed that have been idle for
+        longer than `idle_timeout`; returns how many were closed."""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            stale = [
+                mailbox_id
+                for mailbox_id, pool in self._pools.items()
+                if mailbox_id != DEFAULT_MAILBOX and pool.in_use == 0 and pool.last_used < cutoff
+            ]
+            pools = [self._pools.pop(mailbox_id) for mailbox_id in stale]
+        for pool in pools:
+            pool.close()
+        return len(pools)
+
+    def close(self) -> None:
+        """Close the pools of every open shard, including the default one."""
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            pool.close()
+
+    @property
+    def open_shards(self) -> int:
+        return len(self._pools)
+
+    def mailbox_ids(self) -> list[str]:
+        """Ids of every open mailbox, the default one first."""
+        with self._lock:
+            return list(self._pools)
+
+    def database_paths(self) -> list[str]:
+        """Database files of every open shard, the default one first."""
+        with self._lock:
+            return [pool.database_path for pool in self._pools.values()]
+
+    def stats(self) -> dict:
+        """Connection counts summed over every open shard's pool."""
+        with self._lock:
+            pools = list(self._pools.values())
+        return {
+            "open_shards": len(pools),
+            "in_use": sum(p.in_use for p in pools),
+            "idle": sum(p.idle for p in pools),
+        }
+
+
+pool = ConnectionPool()
+shards = ShardRouter(pool)
+
+
 @contextmanager
-def get_db() -> Generator[sqlite3.Connection, None, None]:
-    """Context manager for database connections."""
-    conn = get_connection()
+def get_db(mailbox_id: Optional[str] = None) -> Generator[sqlite3.Connection, None, None]:
+    """Context manager for database connections borrowed from the pool of
+    `mailbox_id`'s shard (the default database when omitted)."""
+    shard_pool = shards.pool_for(mailbox_id) if mailbox_id else pool
+    conn = shard_pool.acquire()
     try:
         yield conn
         conn.commit()
@@ -24,4 +233,54 @@ def get_db() -> Generator[sqlite3.Connection, None, None]:
         conn.rollback()
         raise
     finally:
-        conn.close()
+        shard_pool.release(conn)
+
+
+# Dedicated threads for blocking SQLite calls made from async route handlers,
+# sized to the pool so every worker can hold a warm connection.
+executor = ThreadPoolExecutor(
+    max_workers=DATABASE_EXECUTOR_WORKERS, thread_name_prefix="sqlite"
+)
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking database function on the database executor.
+
+    The caller's context is copied onto the worker thread so statement
+    timings land on the current request.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(_timed_call, func, *args, **kwargs)
+    return await loop.run_in_executor(executor, context.run, call)
+
+
+def _timed_call(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    started = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        record_db_call(time.perf_counter() - started)
+
+
+async def iterate_db(iterator: Iterator[T]) -> AsyncIterator[T]:
+    """Drive a blocking generator (e.g. a fetchmany() loop) on the database
+    executor, one item per hop, closing it if the consumer stops early."""
+    done = object()
+    # A cancelled hop keeps running on its worker; close() waits for it
+    # rather than failing with "generator already executing"
+    lock = threading.Lock()
+
+    def step():
+        with lock:
+            return next(iterator, done)
+
+    def close():
+        with lock:
+            iterator.close()
+
+    try:
+        while (item := await run_db(step)) is not done:
+            yield item
+    finally:
+        await run_db(close)
@@ -0,0 +1,36 @@
+from fastapi import Depends, HTTPException, Request
+
+from app.database import DEFAULT_MAILBOX, MAILBOX_ID_PATTERN, run_db, shards
+from app.writeback import flag_writes
+
+
+async def get_new_mailbox_id(request: Request) -> str:
+    """Mailbox addressed by the request, created on first use.
+
+    Routes mounted under `/mailboxes/{mailbox_id}` use that path segment; the
+    unprefixed routes serve the default mailbox. Only routes that add emails
+    or attachments use this; everything else uses `get_mailbox_id`.
+    """
+    mailbox_id = request.path_params.get("mailbox_id", DEFAULT_MAILBOX)
+    if not MAILBOX_ID_PATTERN.match(mailbox_id):
+        raise HTTPException(status_code=400, detail="Invalid mailbox id")
+    return mailbox_id
+
+
+async def get_mailbox_id(mailbox_id: str = Depends(get_new_mailbox_id)) -> str:
+    """Mailbox addressed by the request, which must already exist, so reads
+    and updates never create shard files."""
+    # Open shards are known in memory; only a closed one needs a file check
+    if not shards.is_open(mailbox_id) and not await run_db(shards.exists, mailbox_id):
+        raise HTTPException(status_code=404, detail="Mailbox not found")
+    return mailbox_id
+
+
+async def get_synced_mailbox_id(mailbox_id: str = Depends(get_mailbox_id)) -> str:
+    """`get_mailbox_id` for routes that read or rewrite emails: flag updates
+    still queued for the mailbox are committed first (read-your-writes)."""
+    try:
+        await flag_writes.flush(mailbox_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    return mailbox_id
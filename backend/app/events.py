@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+from typing import NamedTuple, Optional
+
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "256"))  # events buffered per client
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))  # s
+
+
+class Event(NamedTuple):
+    """A mailbox change notification. `id` is the change-log seq it reflects."""
+    id: int
+    type: str
+    data: dict
+
+    def encode(self) -> bytes:
+        """Format as a Server-Sent Events message."""
+        data = json.dumps(self.data, ensure_ascii=False, separators=(",", ":"))
+        return f"id: {self.id}\nevent: {self.type}\ndata: {data}\n\n".encode()
+
+
+class Subscription:
+    """One client's bounded event queue.
+
+    When the client falls `SSE_QUEUE_SIZE` events behind, everything queued is
+    dropped and replaced by a single `resync` event carrying an id the client
+    can catch up from through the change log, instead of the server buffering
+    without limit. Events may be published slightly out of seq order, so that
+    id is below every dropped event as well as the last one delivered.
+    """
+
+    def __init__(self, mailbox_id: str, size: int = SSE_QUEUE_SIZE):
+        self.mailbox_id = mailbox_id
+        self.queue: asyncio.Queue[Optional[Event]] = asyncio.Queue(maxsize=size)
+        self.last_id = 0  # id of the last event handed to the client
+        self.dropped = 0
+
+    def push(self, event: Optional[Event]) -> None:
+        if self.queue.full():
+            self.dropped += self.queue.qsize()
+            since = self.last_id
+            while not self.queue.empty():
+                dropped = self.queue.get_nowait()
+                if dropped is not None:
+                    if dropped.type == "resync":
+                        since = min(since, dropped.data["since"])
+                    else:
+                        since = min(since, dropped.id - 1)
+            if event is not None:
+                since = min(since, event.id - 1)
+                event = Event(event.id, "resync", {"since": since})
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> Optional[Event]:
+        """Next event; raises TimeoutError if none arrives within `timeout`."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class EventBroker:
+    """In-process async pub/sub of mailbox change events.
+
+    Write routes publish; each open event stream holds a Subscription. Events
+    only reach streams served by the same process.
+    """
+
+    def __init__(self):
+        self._subscribers: dict[str, set[Subscription]] = {}
+
+    def subscribe(self, mailbox_id: str) -> Subscription:
+        subscription = Subscription(mailbox_id)
+        self._subscribers.setdefault(mailbox_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.mailbox_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.mailbox_id]
+
+    def publish(self, mailbox_id: str, event: Event) -> None:
+        for subscription in self._subscribers.get(mailbox_id, ()):
+            subscription.push(event)
+
+    def close(self) -> None:
+        """End every open stream (on shutdown)."""
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                subscription.push(None)
+
+    def stats(self) -> dict:
+        return {
+            "mailboxes": len(self._subscribers),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+        }
+
+
+email_events = EventBroker()
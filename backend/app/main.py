@@ -1,33 +1,125 @@
+import asyncio
+import contextlib
+import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.routes import health_router, items_router, emails_router
+from app.cache import email_cache
+from app.changelog import EMAIL_CHANGES_PRUNE_INTERVAL, prune_changes
+from app.compression import CompressionMiddleware
+from app.database import (
+    DATABASE_PATH,
+    DATABASE_SHARD_IDLE_TIMEOUT,
+    executor,
+    iterate_db,
+    run_db,
+    shards,
+)
+from app.events import email_events
+from app.metrics import MetricsMiddleware
+from app.migrator import (
+    MIGRATE_ON_STARTUP,
+    MIGRATION_BACKFILL_PAUSE_MS,
+    run_backfills,
+    upgrade_database,
+)
+from app.writeback import FLAG_WRITE_BEHIND, flag_writes
+from app.routes import (
+    health_router,
+    items_router,
+    emails_router,
+    attachments_router,
+    threads_router,
+    metrics_router,
+)
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_CHECK_INTERVAL = 5  # seconds between looks for newly opened shards
 
 
 def _run_migrations():
     """Run all pending database migrations on startup."""
-    import importlib, os, glob
-    migrations_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations")
-    pattern = os.path.join(migrations_dir, "[0-9][0-9][0-9]_*.py")
-    for filepath in sorted(glob.glob(pattern)):
-        spec = importlib.util.spec_from_file_location(
-            os.path.basename(filepath).replace(".py", ""), filepath
-        )
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        module.upgrade()
+    upgrade_database(DATABASE_PATH)
+
+
+async def _close_idle_shards():
+    """Periodically close mailbox shards nobody has used for a while."""
+    while True:
+        await asyncio.sleep(DATABASE_SHARD_IDLE_TIMEOUT / 2)
+        await run_db(shards.close_idle)
+
+
+async def _prune_change_logs():
+    """Periodically trim the change log of every open mailbox."""
+    while True:
+        await asyncio.sleep(EMAIL_CHANGES_PRUNE_INTERVAL)
+        for mailbox_id in shards.mailbox_ids():
+            try:
+                await run_db(prune_changes, mailbox_id)
+            except Exception:
+                logger.exception("Pruning the change log of %s failed", mailbox_id)
+
+
+async def _run_backfills():
+    """Finish online migrations of the default database and of each mailbox
+    shard once it is opened, one short transaction at a time."""
+    checked: set[str] = set()
+    while True:
+        for path in shards.database_paths():
+            if path in checked:
+                continue
+            steps = 0
+            try:
+                # aclosing: a cancelled pause still closes the generator now
+                async with contextlib.aclosing(iterate_db(run_backfills(path))) as batches:
+                    async for _ in batches:
+                        steps += 1
+                        await asyncio.sleep(MIGRATION_BACKFILL_PAUSE_MS / 1000)
+            except Exception:
+                logger.exception("Backfill of %s failed; retrying", path)
+                continue
+            finally:
+                if steps:
+                    # Backfills may rewrite served data (e.g. previews)
+                    email_cache.clear()
+            checked.add(path)
+        await asyncio.sleep(BACKFILL_CHECK_INTERVAL)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    _run_migrations()
+    if MIGRATE_ON_STARTUP:
+        _run_migrations()
+    sweeper = asyncio.create_task(_close_idle_shards())
+    flusher = asyncio.create_task(flag_writes.run()) if FLAG_WRITE_BEHIND else None
+    backfiller = asyncio.create_task(_run_backfills())
+    pruner = asyncio.create_task(_prune_change_logs())
     yield
+    tasks = [task for task in (sweeper, backfiller, pruner, flusher) if task is not None]
+    for task in tasks:
+        task.cancel()
+    # Let them finish unwinding (iterate_db closes its generator on the
+    # executor) before the executor shuts down
+    for task in tasks:
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    await flag_writes.flush_all()  # commit queued flag updates before closing
+    email_events.close()
+    executor.shutdown(wait=True)
+    shards.close()
 
 
 app = FastAPI(title="Email Client API", version="1.0.0", lifespan=lifespan)
 
+# Compress text responses (cached email responses arrive precompressed)
+app.add_middleware(CompressionMiddleware)
+
+# Per-route latency and Server-Timing, measured around compression
+app.add_middleware(MetricsMiddleware)
+
 # CORS – allow the Next.js frontend
 app.add_middleware(
     CORSMiddleware,
@@ -35,12 +127,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing"],
 )
 
 # Register routers
 app.include_router(health_router)
 app.include_router(items_router)
 app.include_router(emails_router)
+app.include_router(attachments_router)
+app.include_router(threads_router)
+app.include_router(metrics_router)
+
+# Mailbox-scoped API: each mailbox is served from its own database shard
+for router in (emails_router, attachments_router, threads_router):
+    app.include_router(router, prefix="/mailboxes/{mailbox_id}")
 
 
 if __name__ == "__main__":
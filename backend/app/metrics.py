@@ -0,0 +1,301 @@
+import bisect
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Seconds; spans cached hits (sub-millisecond) to slow exports
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+# --------------- Metric types ---------------
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value:g}"
+
+
+class Histogram:
+    """Fixed-bucket histogram with labels."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def expose(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+        for labels, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_labels = _labels(self.labelnames + ("le",), labels + (le,))
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total:.6f}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {count}"
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time from request to the end of the response body",
+    ("method", "route", "status"),
+)
+db_statement_duration = Histogram(
+    "db_statement_duration_seconds",
+    "Time spent executing SQL statements and fetching their rows",
+    ("statement",),
+)
+db_statement_rows = Counter(
+    "db_statement_rows_total", "Rows fetched from SQL statements", ("statement",)
+)
+db_connect_duration = Histogram(
+    "db_connect_duration_seconds", "Time to open and configure a SQLite connection"
+)
+db_call_duration = Histogram(
+    "db_call_duration_seconds",
+    "Time database functions spend on the executor (SQL plus row conversion)",
+)
+serialize_duration = Histogram(
+    "serialize_duration_seconds", "Time spent encoding JSON response bodies"
+)
+
+REGISTRY = (
+    http_request_duration,
+    db_statement_duration,
+    db_statement_rows,
+    db_connect_duration,
+    db_call_duration,
+    serialize_duration,
+)
+
+
+# --------------- Per-request timings ---------------
+
+class RequestTimings:
+    """Time spent per phase while serving one request (seconds)."""
+
+    __slots__ = ("connect", "sql", "db", "serialize", "rows")
+
+    def __init__(self):
+        self.connect = 0.0
+        self.sql = 0.0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.rows = 0
+
+    def server_timing(self, total: float) -> str:
+        phases = [
+            ("connect", self.connect), ("sql", self.sql), ("db", self.db),
+            ("serialize", self.serialize), ("total", total),
+        ]
+        return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in phases)
+
+
+# Set by MetricsMiddleware; run_db copies it onto executor threads
+request_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def record_connect(seconds: float) -> None:
+    db_connect_duration.observe((), seconds)
+    timings = request_timings.get()
+    if timings is not None:
+        timings.connect += seconds
+
+
+def record_db_call(seconds: float) -> None:
+    db_call_duration.observe((), seconds)
+    timings = request_timings.get()
+    if timings is not None:
+        timings.db += seconds
+
+
+def record_serialize(seconds: float) -> None:
+    serialize_duration.observe((), seconds)
+    timings = request_timings.get()
+    if timings is not None:
+        timings.serialize += seconds
+
+
+def _record_statement(statement: str, seconds: float, rows: int) -> None:
+    db_statement_duration.observe((statement,), seconds)
+    if rows:
+        db_statement_rows.inc((statement,), rows)
+    timings = request_timings.get()
+    if timings is not None:
+        timings.sql += seconds
+        timings.rows += rows
+
+
+# --------------- SQLite instrumentation ---------------
+
+def _statement_kind(sql: str) -> str:
+    """First keyword of a statement (SELECT, INSERT, ...), the metric label."""
+    words = sql.split(None, 1)
+    return words[0].upper() if words else "OTHER"
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times each statement, including fetching its rows, and
+    counts the rows fetched. Statements are labelled by their first keyword."""
+
+    _statement = "OTHER"
+
+    def execute(self, sql, parameters=()):
+        self._statement = _statement_kind(sql)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_statement(self._statement, time.perf_counter() - started, 0)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._statement = _statement_kind(sql)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_statement(self._statement, time.perf_counter() - started, 0)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        _record_statement(self._statement, time.perf_counter() - started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        _record_statement(self._statement, time.perf_counter() - started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        _record_statement(self._statement, time.perf_counter() - started, len(rows))
+        return rows
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors (including `execute` shortcuts) are
+    InstrumentedCursors."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# --------------- Middleware ---------------
+
+class MetricsMiddleware:
+    """Record per-route request latency and add a Server-Timing header
+    breaking the request down into connect, SQL, executor and serialization
+    time. Event streams are not timed."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+        streaming = False
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(raw=message["headers"])
+                streaming = headers.get("content-type", "").startswith("text/event-stream")
+                headers["Server-Timing"] = timings.server_timing(time.perf_counter() - started)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timings.reset(token)
+            if not streaming:
+                route = scope.get("route")
+                path = getattr(route, "path", None) or "unmatched"
+                http_request_duration.observe(
+                    (scope["method"], path, str(status)), time.perf_counter() - started
+                )
+
+
+def expose(extra: Iterable[str] = ()) -> str:
+    """All registered metrics plus `extra` lines in Prometheus text format."""
+    lines = [line for metric in REGISTRY for line in metric.expose()]
+    lines.extend(extra)
+    return "\n".join(lines) + "\n"
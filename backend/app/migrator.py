@@ -0,0 +1,374 @@
+"""
+Migration engine shared by app startup, mailbox shards and migrate.py.
+
+Each file in migrations/ defines `apply(cursor, database_path)` and
+`revert(cursor)`. Applied migrations are recorded in `_migrations` with a
+checksum of their source; an upgrade reads that table once, verifies the
+checksums, and imports and runs only the pending files, each in its own
+transaction together with its `_migrations` row.
+
+Online migrations keep `apply` to quick schema changes and leave the slow
+part to `run_backfills`, which runs outside the upgrade in short batches
+while the API keeps serving:
+
+    BACKFILL_TABLE = "emails"
+    def backfill(cursor, start, end): ...  # rows with start < rowid <= end
+
+Their `_migrations` row has status `backfilling` (with the last rowid done
+in `progress`), then `complete`, so an interrupted backfill resumes where it
+stopped. Rows written after `apply` must be handled by the
+application (e.g. triggers or the write path), and later migrations must not
+rely on the backfill having finished.
+"""
+
+import glob
+import hashlib
+import importlib.util
+import os
+import sqlite3
+from typing import Iterator, Optional
+
+from app.database import DATABASE_JOURNAL_MODE
+
+MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations"
+)
+
+# Set to false when migrations run as a separate deploy step (see Dockerfile)
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# Rows per backfill transaction, and the pause between batches that lets
+# API writers take the database lock
+MIGRATION_BACKFILL_BATCH_SIZE = int(os.getenv("MIGRATION_BACKFILL_BATCH_SIZE", "1000"))
+MIGRATION_BACKFILL_PAUSE_MS = int(os.getenv("MIGRATION_BACKFILL_PAUSE_MS", "10"))
+
+# Columns added to _migrations after its first release
+MIGRATIONS_COLUMNS = {
+    "checksum": "TEXT",
+    "status": "TEXT NOT NULL DEFAULT 'complete'",
+    "progress": "INTEGER",
+}
+
+_modules: dict = {}
+_checksums: dict = {}
+
+
+class MigrationError(Exception):
+    """The database's migration history does not match migrations/."""
+
+
+def get_migration_files() -> list[str]:
+    """Get all migration files sorted by version number."""
+    pattern = os.path.join(MIGRATIONS_DIR, "[0-9][0-9][0-9]_*.py")
+    return sorted(glob.glob(pattern))
+
+
+def migration_name(filepath: str) -> str:
+    return os.path.basename(filepath).replace(".py", "")
+
+
+def migration_checksum(filepath: str) -> str:
+    """SHA-256 of a migration's source (once per process)."""
+    if filepath not in _checksums:
+        with open(filepath, "rb") as f:
+            _checksums[filepath] = hashlib.sha256(f.read()).hexdigest()
+    return _checksums[filepath]
+
+
+def load_migration_module(filepath: str):
+    """Dynamically load a migration module (once per process)."""
+    if filepath not in _modules:
+        module_name = os.path.basename(filepath).replace(".py", "")
+        spec = importlib.util.spec_from_file_location(module_name, filepath)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[filepath] = module
+    return _modules[filepath]
+
+
+# --------------- Migration history ---------------
+
+def _connect(database_path: str) -> sqlite3.Connection:
+    # Autocommit: transactions are opened explicitly around each migration.
+    # Not tied to one thread: iterate_db runs each run_backfills step on
+    # whichever executor worker is free (one step at a time).
+    conn = sqlite3.connect(database_path, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout = 30000")  # another process may be migrating
+    # Switch the file to the app's journal mode before any migration or
+    # backfill transaction: in WAL the pool's connections read (and set the
+    # same mode) while a backfill batch holds the write lock.
+    conn.execute(f"PRAGMA journal_mode = {DATABASE_JOURNAL_MODE}")
+    return conn
+
+
+def _applied_migrations(cursor) -> dict[str, sqlite3.Row]:
+    """name -> `_migrations` row of every recorded migration."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS _migrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            checksum TEXT,
+            status TEXT NOT NULL DEFAULT 'complete',
+            progress INTEGER
+        )
+    """)
+    cursor.execute("PRAGMA table_info(_migrations)")
+    columns = {row["name"] for row in cursor.fetchall()}
+    for column, definition in MIGRATIONS_COLUMNS.items():
+        if column not in columns:
+            # Tables created by earlier versions of the engine
+            try:
+                cursor.execute(f"ALTER TABLE _migrations ADD COLUMN {column} {definition}")
+            except sqlite3.OperationalError:
+                pass  # added concurrently
+    cursor.execute("SELECT * FROM _migrations")
+    return {row["name"]: row for row in cursor.fetchall()}
+
+
+def _verify_checksums(cursor, applied: dict[str, sqlite3.Row]) -> None:
+    """Fail if an applied migration's file has changed since it ran.
+
+    Rows recorded before checksums existed adopt the current file's.
+    """
+    for filepath in get_migration_files():
+        name = migration_name(filepath)
+        if name not in applied:
+            continue
+        recorded = applied[name]["checksum"]
+        checksum = migration_checksum(filepath)
+        if recorded is None:
+            cursor.execute(
+                "UPDATE _migrations SET checksum = ? WHERE name = ? AND checksum IS NULL",
+                (checksum, name),
+            )
+        elif recorded != checksum:
+            raise MigrationError(
+                f"Migration {name} was modified after it was applied. Restore the "
+                "file, or run `python migrate.py repair` if the change is intended."
+            )
+
+
+def _initial_status(module) -> str:
+    """`_migrations.status` of a migration right after `apply`."""
+    return "backfilling" if hasattr(module, "backfill") else "complete"
+
+
+def _apply(cursor, filepath: str, database_path: str) -> bool:
+    """Run one migration and record it in a single transaction.
+
+    Returns False if another process applied it first.
+    """
+    name = migration_name(filepath)
+    module = load_migration_module(filepath)
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        cursor.execute("SELECT 1 FROM _migrations WHERE name = ?", (name,))
+        if cursor.fetchone():
+            cursor.execute("COMMIT")
+            return False
+        module.apply(cursor, database_path)
+        cursor.execute(
+            "INSERT INTO _migrations (name, checksum, status, progress) VALUES (?, ?, ?, 0)",
+            (name, migration_checksum(filepath), _initial_status(module)),
+        )
+        cursor.execute("COMMIT")
+    except BaseException:
+        if cursor.connection.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+    print(f"Migration {name} applied successfully.")
+    return True
+
+
+def _revert(cursor, filepath: str) -> None:
+    """Revert one migration and drop its record in a single transaction."""
+    name = migration_name(filepath)
+    module = load_migration_module(filepath)
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        module.revert(cursor)
+        cursor.execute("DELETE FROM _migrations WHERE name = ?", (name,))
+        cursor.execute("COMMIT")
+    except BaseException:
+        if cursor.connection.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+    print(f"Migration {name} reverted successfully.")
+
+
+def _backfill_batch(cursor, name: str, module, batch_size: int) -> Optional[int]:
+    """Backfill the next `batch_size` rows in one transaction.
+
+    Returns the last rowid done, or None once the table is finished (the
+    last batch marks the migration `complete`).
+    """
+    table = module.BACKFILL_TABLE
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        # Re-read under the lock: another process may be backfilling too
+        cursor.execute("SELECT status, progress FROM _migrations WHERE name = ?", (name,))
+        row = cursor.fetchone()
+        if row is None or row["status"] != "backfilling":
+            cursor.execute("COMMIT")
+            return None
+        start = row["progress"] or 0
+        cursor.execute(
+            f"SELECT rowid FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT 1 OFFSET ?",
+            (start, batch_size - 1),
+        )
+        end_row = cursor.fetchone()
+        if end_row is None:
+            # Last (partial) batch
+            cursor.execute(f"SELECT max(rowid) FROM {table}")
+            end = max(start, cursor.fetchone()[0] or 0)
+        else:
+            end = end_row[0]
+        if end > start:
+            module.backfill(cursor, start, end)
+        cursor.execute(
+            "UPDATE _migrations SET status = ?, progress = ? WHERE name = ?",
+            ("backfilling" if end_row else "complete", end, name),
+        )
+        cursor.execute("COMMIT")
+    except BaseException:
+        if cursor.connection.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+    return end if end_row else None
+
+
+def run_backfills(
+    database_path: str, batch_size: int = MIGRATION_BACKFILL_BATCH_SIZE
+) -> Iterator[tuple[str, int]]:
+    """Run the unfinished backfills of online migrations.
+
+    A generator: every transaction (one backfill batch) is a step, yielding
+    (migration name, progress), so callers can pause between steps and stop
+    at any point; the next run resumes from `_migrations`.
+    """
+    conn = _connect(database_path)
+    try:
+        cursor = conn.cursor()
+        applied = _applied_migrations(cursor)
+        for filepath in get_migration_files():
+            name = migration_name(filepath)
+            if name not in applied or applied[name]["status"] == "complete":
+                continue
+            module = load_migration_module(filepath)
+            if hasattr(module, "backfill"):
+                while (position := _backfill_batch(cursor, name, module, batch_size)) is not None:
+                    yield name, position
+            # Also completes rows an older version left as `indexing`
+            cursor.execute("UPDATE _migrations SET status = 'complete' WHERE name = ?", (name,))
+            print(f"Migration {name} backfill complete.")
+    finally:
+        conn.close()
+
+
+# --------------- Commands ---------------
+
+def upgrade_database(database_path: str) -> None:
+    """Apply every pending migration to the database at `database_path`.
+
+    Up to date databases cost one read of `_migrations`; no migration module
+    is imported.
+    """
+    conn = _connect(database_path)
+    try:
+        cursor = conn.cursor()
+        applied = _applied_migrations(cursor)
+        _verify_checksums(cursor, applied)
+        for filepath in get_migration_files():
+            if migration_name(filepath) not in applied:
+                _apply(cursor, filepath, database_path)
+    finally:
+        conn.close()
+
+
+def downgrade_database(database_path: str, steps: Optional[int] = None) -> None:
+    """Revert the last `steps` applied migrations (all when None), newest first."""
+    conn = _connect(database_path)
+    try:
+        cursor = conn.cursor()
+        applied = _applied_migrations(cursor)
+        files = [f for f in reversed(get_migration_files()) if migration_name(f) in applied]
+        for filepath in files[:steps]:
+            _revert(cursor, filepath)
+    finally:
+        conn.close()
+
+
+def migration_status(database_path: str) -> list[tuple[str, str, Optional[str]]]:
+    """(name, status, detail) per migration file. Status is PENDING, APPLIED,
+    MODIFIED (applied, but the file changed since) or BACKFILLING;
+    detail is when it was applied and how far a backfill has got."""
+    conn = _connect(database_path)
+    try:
+        cursor = conn.cursor()
+        applied = _applied_migrations(cursor)
+        status = []
+        for filepath in get_migration_files():
+            name = migration_name(filepath)
+            row = applied.get(name)
+            if row is None:
+                status.append((name, "PENDING", None))
+                continue
+            detail = f"at {row['applied_at']}"
+            if row["checksum"] is not None and row["checksum"] != migration_checksum(filepath):
+                state = "MODIFIED"
+            elif row["status"] == "backfilling":
+                state = "BACKFILLING"
+                table = load_migration_module(filepath).BACKFILL_TABLE
+                cursor.execute(f"SELECT max(rowid) FROM {table}")
+                last = cursor.fetchone()[0] or 0
+                detail += f", rowid {row['progress']} of {last}"
+            else:
+                state = "APPLIED"
+            status.append((name, state, detail))
+        return status
+    finally:
+        conn.close()
+
+
+def repair_checksums(database_path: str) -> None:
+    """Record the current checksum of every applied migration."""
+    conn = _connect(database_path)
+    try:
+        cursor = conn.cursor()
+        applied = _applied_migrations(cursor)
+        for filepath in get_migration_files():
+            name = migration_name(filepath)
+            if name in applied:
+                cursor.execute(
+                    "UPDATE _migrations SET checksum = ? WHERE name = ?",
+                    (migration_checksum(filepath), name),
+                )
+    finally:
+        conn.close()
+
+
+def run_upgrade(filepath: str, database_path: str) -> None:
+    """Apply a single migration file (its `upgrade` command-line entry point)."""
+    conn = _connect(database_path)
+    try:
+        cursor = conn.cursor()
+        _applied_migrations(cursor)  # creates _migrations on a new database
+        if not _apply(cursor, os.path.abspath(filepath), database_path):
+            print(f"Migration {migration_name(filepath)} already applied. Skipping.")
+    finally:
+        conn.close()
+
+
+def run_downgrade(filepath: str, database_path: str) -> None:
+    """Revert a single migration file (its `downgrade` entry point)."""
+    conn = _connect(database_path)
+    try:
+        cursor = conn.cursor()
+        if migration_name(filepath) not in _applied_migrations(cursor):
+            print(f"Migration {migration_name(filepath)} is not applied. Skipping.")
+            return
+        _revert(cursor, os.path.abspath(filepath))
+    finally:
+        conn.close()
@@ -0,0 +1,27 @@
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(*position) -> str:
+    """Encode a keyset position (e.g. date, id) as an opaque cursor string."""
+    raw = json.dumps(list(position)).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: tuple = (str, str)) -> tuple:
+    """Decode a cursor produced by `encode_cursor`, checking value types."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(position, list) or len(position) != len(types):
+            raise ValueError
+        if not all(isinstance(v, t) for v, t in zip(position, types)):
+            raise ValueError
+        return tuple(position)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
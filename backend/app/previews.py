@@ -0,0 +1,131 @@
+"""
+Email preview generation.
+
+`make_preview` turns a body (plain text, or HTML from a rich-text composer)
+into the list-panel preview: markup and quoted replies are dropped,
+whitespace is collapsed and the text is cut after PREVIEW_LENGTH grapheme
+clusters, so an accent or emoji sequence is never split. Previews are made
+once when a body is written; `recompute_previews` refreshes stored ones in
+batches (see migrations/011_recompute_email_previews.py).
+"""
+
+import html
+import re
+import unicodedata
+
+from app.bodies import EMAIL_TABLES, decode_body
+
+PREVIEW_LENGTH = 80  # grapheme clusters shown before "..."
+
+# Tags that mark a body as HTML; a bare `<user@example.com>` does not
+_HTML_TAG_RE = re.compile(
+    r"</?(?:html|body|div|p|br|span|a|b|i|u|em|strong|blockquote|table|tr|td|"
+    r"ul|ol|li|h[1-6]|font|img|hr|pre|code)\b[^>]*>",
+    re.IGNORECASE,
+)
+_HIDDEN_ELEMENT_RE = re.compile(
+    r"<(script|style|head|title)\b.*?</\1\s*>|<!--.*?-->", re.IGNORECASE | re.DOTALL
+)
+# Innermost blockquote; removed repeatedly to handle nesting
+_BLOCKQUOTE_RE = re.compile(
+    r"<blockquote\b[^>]*>(?:(?!<blockquote\b).)*?</blockquote\s*>",
+    re.IGNORECASE | re.DOTALL,
+)
+_LINE_BREAK_TAG_RE = re.compile(
+    r"<br\b[^>]*>|</?(?:p|div|li|tr|h[1-6]|pre|table)\b[^>]*>", re.IGNORECASE
+)
+_TAG_RE = re.compile(r"<[^>]*>")
+
+# Start of a quoted reply or forward in plain text; it and what follows go
+_QUOTE_HEADER_RE = re.compile(
+    r"^(?:On\b.{0,200}\bwrote:\s*$"
+    r"|-{2,}\s*(?:Original|Forwarded) Message\s*-{2,}"
+    r"|From:.*\n(?:Sent|Date):)",
+    re.MULTILINE | re.IGNORECASE,
+)
+
+# Zero-width spaces, BOMs and soft hyphens, dropped before collapsing whitespace
+_INVISIBLE = dict.fromkeys(map(ord, "\u200b\u200c\ufeff\u00ad"))
+
+ZWJ = "\u200d"  # zero-width joiner
+
+
+def _html_to_text(body: str) -> str:
+    body = _HIDDEN_ELEMENT_RE.sub("", body)
+    while True:
+        stripped = _BLOCKQUOTE_RE.sub("", body)
+        if stripped == body:
+            break
+        body = stripped
+    body = _LINE_BREAK_TAG_RE.sub("\n", body)
+    return html.unescape(_TAG_RE.sub("", body))
+
+
+def _strip_quotes(text: str) -> str:
+    """Drop a trailing quoted reply and `>`-quoted lines."""
+    match = _QUOTE_HEADER_RE.search(text)
+    if match:
+        text = text[:match.start()]
+    return "\n".join(line for line in text.splitlines() if not line.lstrip().startswith(">"))
+
+
+def _extends_cluster(previous: str, char: str, regional_run: int) -> bool:
+    """Whether `char` continues the grapheme cluster ending with `previous`
+    (combining marks, variation selectors, emoji modifiers and ZWJ sequences,
+    regional-indicator flag pairs). `regional_run` counts the regional
+    indicators immediately before `char`."""
+    code = ord(char)
+    if unicodedata.category(char) in ("Mn", "Me", "Mc"):
+        return True
+    if char == ZWJ or previous == ZWJ:
+        return True
+    if 0xFE00 <= code <= 0xFE0F or 0xE0100 <= code <= 0xE01EF:  # variation selectors
+        return True
+    if 0x1F3FB <= code <= 0x1F3FF or 0xE0020 <= code <= 0xE007F:  # skin tones, tags
+        return True
+    return 0x1F1E6 <= code <= 0x1F1FF and regional_run % 2 == 1
+
+
+def _truncate(text: str, length: int) -> str:
+    clusters = 0
+    regional_run = 0
+    previous = ""
+    for index, char in enumerate(text):
+        if not previous or not _extends_cluster(previous, char, regional_run):
+            clusters += 1
+            if clusters > length:
+                return text[:index].rstrip() + "..."
+        regional_run = regional_run + 1 if 0x1F1E6 <= ord(char) <= 0x1F1FF else 0
+        previous = char
+    return text
+
+
+def make_preview(body: str) -> str:
+    """List-panel preview of an email body."""
+    text = _html_to_text(body) if _HTML_TAG_RE.search(body) else body
+    unquoted = _strip_quotes(text)
+    if unquoted.strip():  # a body that is all quote keeps the quote
+        text = unquoted
+    text = unicodedata.normalize("NFC", text).translate(_INVISIBLE)
+    return _truncate(" ".join(text.split()), PREVIEW_LENGTH)
+
+
+def recompute_previews(cursor, where: str, params: tuple = ()) -> int:
+    """Regenerate the previews of the emails matching `where` (on the
+    EMAIL_TABLES join), writing only those that change. Returns how many
+    changed."""
+    cursor.execute(
+        f"""SELECT emails.id, emails.preview, emails.body,
+                   email_bodies.codec, email_bodies.data
+            FROM {EMAIL_TABLES} WHERE ({where})""",
+        params,
+    )
+    changed = []
+    for email_id, preview, body, codec, data in cursor.fetchall():
+        if data is not None:
+            body = decode_body(codec, data)
+        new_preview = make_preview(body)
+        if new_preview != preview:
+            changed.append((new_preview, email_id))
+    cursor.executemany("UPDATE emails SET preview = ? WHERE id = ?", changed)
+    return len(changed)
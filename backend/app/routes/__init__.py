@@ -1,5 +1,15 @@
 from app.routes.health import router as health_router
 from app.routes.items import router as items_router
 from app.routes.emails import router as emails_router
+from app.routes.attachments import router as attachments_router
+from app.routes.threads import router as threads_router
+from app.routes.metrics import router as metrics_router
 
-__all__ = ["health_router", "items_router", "emails_router"]
+__all__ = [
+    "health_router",
+    "items_router",
+    "emails_router",
+    "attachments_router",
+    "threads_router",
+    "metrics_router",
+]
@@ -0,0 +1,211 @@
+import hashlib
+import os
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from app.database import get_db, run_db
+from app.dependencies import get_mailbox_id, get_new_mailbox_id
+from app.serialization import json_response
+from app.storage import MAX_ATTACHMENT_BYTES, blob_store
+
+router = APIRouter(prefix="/attachments", tags=["attachments"])
+
+RANGE_CHUNK_SIZE = 64 * 1024
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+# --------------- Pydantic Models ---------------
+
+class StoredAttachment(BaseModel):
+    id: str
+    email_id: Optional[str]
+    filename: str
+    content_type: str
+    size: str
+    bytes: int
+    sha256: str
+    url: str
+
+
+# --------------- Helpers ---------------
+
+def _format_size(size: float) -> str:
+    """Human-readable size in the style of the Attachment model ("1.5 MB")."""
+    if size < 1024:
+        return f"{int(size)} B"
+    for unit in ("KB", "MB", "GB"):
+        size /= 1024
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f}".rstrip("0").rstrip(".") + f" {unit}"
+
+
+def _row_to_attachment(row, base_url: str) -> dict:
+    """`base_url` is the attachments collection path the upload was made to."""
+    return {
+        "id": row["id"],
+        "email_id": row["email_id"],
+        "filename": row["filename"],
+        "content_type": row["content_type"],
+        "size": _format_size(row["size"]),
+        "bytes": row["size"],
+        "sha256": row["sha256"],
+        "url": f"{base_url}/{row['id']}",
+    }
+
+
+def _parse_range(range_header: str, size: int) -> Optional[tuple[int, int]]:
+    """Parse a single `bytes=` range into inclusive (start, end).
+
+    Returns None when the header should be ignored (multiple or malformed
+    ranges) and raises 416 when the range cannot be satisfied.
+    """
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:  # suffix range: the last N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+def _read_range(path: str, start: int, end: int):
+    """Yield the bytes of `path` from `start` to `end` inclusive in chunks."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+# --------------- Queries ---------------
+
+def _insert_attachment(
+    mailbox_id: str, base_url: str, filename: str, content_type: str, size: int, sha256: str
+) -> dict:
+    """Record an uploaded blob as a new attachment."""
+    try:
+        with get_db(mailbox_id) as conn:
+            cursor = conn.cursor()
+            attachment_id = uuid.uuid4().hex
+            now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+            cursor.execute(
+                """INSERT INTO attachments
+                   (id, filename, content_type, size, sha256, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (attachment_id, filename, content_type, size, sha256, now),
+            )
+            cursor.execute("SELECT * FROM attachments WHERE id = ?", (attachment_id,))
+            return _row_to_attachment(cursor.fetchone(), base_url)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+def _get_attachment(mailbox_id: str, attachment_id: str):
+    """Select an attachment row by ID."""
+    try:
+        with get_db(mailbox_id) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM attachments WHERE id = ?", (attachment_id,))
+            row = cursor.fetchone()
+            if row is None:
+                raise HTTPException(status_code=404, detail="Attachment not found")
+            return row
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+# --------------- Routes ---------------
+
+@router.post("", status_code=201, response_model=StoredAttachment)
+async def upload_attachment(
+    request: Request,
+    filename: str = Query(..., min_length=1),
+    mailbox_id: str = Depends(get_new_mailbox_id),
+):
+    """Upload a file as the raw request body.
+
+    The body is streamed to disk while being hashed; identical content is
+    stored once. The returned `url`, `filename` and `size` can be passed as an
+    attachment of `POST /emails`.
+    """
+    content_type = request.headers.get("content-type", "application/octet-stream")
+    digest = hashlib.sha256()
+    size = 0
+    temp = await run_in_threadpool(blob_store.create_temp)
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MAX_ATTACHMENT_BYTES:
+                raise HTTPException(status_code=413, detail="Attachment too large")
+            digest.update(chunk)
+            await run_in_threadpool(temp.write, chunk)
+        await run_in_threadpool(temp.close)
+        sha256 = digest.hexdigest()
+        await run_in_threadpool(blob_store.commit, temp.name, sha256)
+    except BaseException:
+        temp.close()
+        blob_store.discard(temp.name)
+        raise
+
+    base_url = request.url.path.rstrip("/")
+    attachment = await run_db(
+        _insert_attachment, mailbox_id, base_url, filename, content_type, size, sha256
+    )
+    return json_response(attachment, status_code=201)
+
+
+@router.get("/{attachment_id}")
+async def download_attachment(
+    attachment_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    mailbox_id: str = Depends(get_mailbox_id),
+):
+    """Download an attachment, honoring a single-range `Range` header."""
+    row = await run_db(_get_attachment, mailbox_id, attachment_id)
+    path = blob_store.path(row["sha256"])
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Attachment content missing")
+
+    size = row["size"]
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{row["sha256"]}"',
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(row['filename'])}",
+    }
+    byte_range = _parse_range(range_header, size) if range_header and size else None
+    if byte_range is None:
+        return FileResponse(path, media_type=row["content_type"], headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _read_range(path, start, end),
+        status_code=206,
+        media_type=row["content_type"],
+        headers=headers,
+    )
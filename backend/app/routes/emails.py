@@ -1,14 +1,72 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
+from typing import Optional, Union
+import asyncio
 import json
 import uuid
+import zlib
 from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
-from app.database import get_db
+from app.bodies import EMAIL_COLUMNS, EMAIL_TABLES, move_bodies, row_body, update_body
+from app.cache import CachedResponse, email_cache
+from app.changelog import change_horizon, latest_change_seq
+from app.compression import COMPRESSION_MIN_SIZE, compress, negotiate
+from app.database import get_db, iterate_db, run_db
+from app.dependencies import get_mailbox_id, get_new_mailbox_id, get_synced_mailbox_id
+from app.events import SSE_HEARTBEAT_INTERVAL, Event, email_events
+from app.pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor
+from app.previews import make_preview
+from app.serialization import dumps, encode_response, json_response
+from app.writeback import FLAG_WRITE_BEHIND, flag_writes
 
 router = APIRouter(prefix="/emails", tags=["emails"])
 
+MAX_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 500  # rows fetched per fetchmany() while exporting
+IMPORT_BATCH_SIZE = 1000  # default rows per import transaction
+MAX_IMPORT_LINE_BYTES = 16 * 1024 * 1024
+MAX_IMPORT_ERRORS = 100  # per-line errors reported before only counting them
+SSE_RETRY_MS = 3000  # client reconnect delay advertised on /emails/events
+
+# Sender of emails created without an explicit `sender`
+DEFAULT_SENDER = {"name": "Richard Brown", "email": "richard@example.com"}
+
+# Replies join the thread of the email they answer (matched by Message-ID or
+# by our own id); anything else starts a new thread named after itself.
+INSERT_EMAIL_SQL = """INSERT INTO emails
+   (id, sender_name, sender_email, sender_avatar,
+    recipient_name, recipient_email,
+    subject, preview, body, date, is_read, is_archived, attachments,
+    message_id, in_reply_to, thread_id)
+   VALUES (:id, :sender_name, :sender_email, :sender_avatar,
+    :recipient_name, :recipient_email,
+    :subject, :preview, :body, :date, :is_read, :is_archived, :attachments,
+    :message_id, :in_reply_to,
+    COALESCE(
+        (SELECT thread_id FROM emails WHERE message_id = :in_reply_to),
+        (SELECT thread_id FROM emails WHERE id = :in_reply_to),
+        :id))"""
+
+# WHERE clause for each list filter; each is backed by a (flag, date, id) index
+FILTER_CLAUSES = {
+    "all": "1 = 1",
+    "unread": "is_read = 0",
+    "archived": "is_archived = 1",
+}
+
+# Event type pushed on /emails/events for each change-log op
+CHANGE_EVENT_TYPES = {"insert": "created", "update": "updated", "delete": "deleted"}
+
+# Columns needed by the list panel; skips body and attachment JSON. Qualified
+# so the projection can be used in joins.
+SUMMARY_COLUMNS = (
+    "emails.id, emails.sender_name, emails.sender_email, emails.sender_avatar, "
+    "emails.subject, emails.preview, emails.date, emails.is_read, "
+    "emails.is_archived, emails.attachments != '[]' AS has_attachments"
+)
+
 
 # --------------- Pydantic Models ---------------
 
@@ -25,9 +83,41 @@ class Attachment(BaseModel):
 
 class EmailCreate(BaseModel):
     recipient: Person
+    sender: Optional[Person] = None  # defaults to DEFAULT_SENDER
     subject: str
     body: str
     attachments: list[Attachment] = []
+    in_reply_to: Optional[str] = None  # id or Message-ID of the email answered
+
+
+class EmailImport(EmailCreate):
+    """One NDJSON line of a mailbox import (the export format is accepted)."""
+    id: Optional[str] = None
+    message_id: Optional[str] = None
+    sender: Person
+    preview: Optional[str] = None
+    date: Optional[str] = None
+    is_read: bool = False
+    is_archived: bool = False
+
+    @field_validator("date")
+    @classmethod
+    def _normalize_date(cls, value: Optional[str]) -> Optional[str]:
+        """Store dates as UTC `%Y-%m-%dT%H:%M:%S`, the text form lists and
+        cursors sort on. ISO 8601 and RFC 2822 dates are accepted; ones
+        without a UTC offset are taken as UTC."""
+        if value is None:
+            return None
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            try:
+                parsed = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                raise ValueError("expected an ISO 8601 or RFC 2822 date")
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc)
+        return parsed.strftime("%Y-%m-%dT%H:%M:%S")
 
 
 class EmailUpdate(BaseModel):
@@ -37,8 +127,127 @@ class EmailUpdate(BaseModel):
     body: Optional[str] = None
 
 
+class EmailBatch(BaseModel):
+    ids: list[str] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+    is_read: Optional[bool] = None
+    is_archived: Optional[bool] = None
+    delete: bool = False
+
+    @model_validator(mode="after")
+    def _check_operation(self):
+        has_flags = self.is_read is not None or self.is_archived is not None
+        if self.delete and has_flags:
+            raise ValueError("delete cannot be combined with flag updates")
+        if not self.delete and not has_flags:
+            raise ValueError("set is_read, is_archived or delete")
+        return self
+
+
+class Sender(Person):
+    avatar: str = ""
+
+
+class Email(BaseModel):
+    id: str
+    sender: Sender
+    recipient: Person
+    subject: str
+    preview: str
+    body: str
+    date: str
+    is_read: bool
+    is_archived: bool
+    attachments: list[Attachment]
+    message_id: Optional[str] = None
+    in_reply_to: Optional[str] = None
+    thread_id: Optional[str] = None
+
+
+class EmailPage(BaseModel):
+    emails: list[Email]
+    next_cursor: Optional[str]
+
+
+class EmailSummary(BaseModel):
+    id: str
+    sender: Sender
+    subject: str
+    preview: str
+    date: str
+    is_read: bool
+    is_archived: bool
+    has_attachments: bool
+
+
+class EmailSummaryPage(BaseModel):
+    emails: list[EmailSummary]
+    next_cursor: Optional[str]
+
+
+# Every shape GET /emails can return
+EmailList = Union[list[Email], EmailPage, list[EmailSummary], EmailSummaryPage]
+
+
+class SearchHit(EmailSummary):
+    snippet: str
+
+
+class SearchPage(BaseModel):
+    emails: list[SearchHit]
+    next_cursor: Optional[str]
+
+
+class EmailCounts(BaseModel):
+    total: int
+    unread: int
+    archived: int
+
+
+class EmailChange(BaseModel):
+    seq: int
+    id: str
+    op: str  # insert | update | delete
+    email: Optional[Email] = None  # insert only
+    fields: Optional[dict] = None  # update only
+
+
+class EmailChanges(BaseModel):
+    changes: list[EmailChange]
+    next_since: int
+    has_more: bool
+
+
+class BatchItemResult(BaseModel):
+    id: str
+    status: str  # updated | deleted | not_found
+
+
+class BatchResult(BaseModel):
+    results: list[BatchItemResult]
+
+
+class ImportLineError(BaseModel):
+    line: Optional[int]
+    error: str
+
+
+class ImportResult(BaseModel):
+    lines: int
+    imported: int
+    skipped: int
+    failed: int
+    batches: int
+    errors: list[ImportLineError]
+
+
 # --------------- Helpers ---------------
 
+def _make_message_id(sender_email: str) -> str:
+    """Generate an RFC 5322 style Message-ID in the sender's domain."""
+    domain = sender_email.rpartition("@")[2] or "localhost"
+    return f"<{uuid.uuid4().hex}@{domain}>"
+
+
 def _row_to_email(row) -> dict:
     """Convert a sqlite3.Row to a dict matching the API contract."""
     return {
@@ -54,123 +263,340 @@ def _row_to_email(row) -> dict:
         },
         "subject": row["subject"],
         "preview": row["preview"],
-        "body": row["body"],
+        "body": row_body(row),
         "date": row["date"],
         "is_read": bool(row["is_read"]),
         "is_archived": bool(row["is_archived"]),
         "attachments": json.loads(row["attachments"]) if row["attachments"] else [],
+        "message_id": row["message_id"],
+        "in_reply_to": row["in_reply_to"],
+        "thread_id": row["thread_id"],
     }
 
 
-# --------------- Routes ---------------
+def _row_to_summary(row) -> dict:
+    """Convert a row selected with SUMMARY_COLUMNS to a list summary dict."""
+    return {
+        "id": row["id"],
+        "sender": {
+            "name": row["sender_name"],
+            "email": row["sender_email"],
+            "avatar": row["sender_avatar"] or "",
+        },
+        "subject": row["subject"],
+        "preview": row["preview"],
+        "date": row["date"],
+        "is_read": bool(row["is_read"]),
+        "is_archived": bool(row["is_archived"]),
+        "has_attachments": bool(row["has_attachments"]),
+    }
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value matches `etag`."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _conditional_response(
+    key: str,
+    cached: CachedResponse,
+    generation: int,
+    if_none_match: Optional[str],
+    accept_encoding: Optional[str],
+) -> Response:
+    """Return cache entry `key` as JSON, or an empty 304 if the client already
+    has it.
+
+    Bodies of at least COMPRESSION_MIN_SIZE are sent in the encoding the
+    client accepts, compressed once and kept with the cache entry. Each
+    encoding gets its own ETag (``"m12"`` becomes ``"m12-gzip"``).
+    """
+    encoding = negotiate(accept_encoding) if len(cached.body) >= COMPRESSION_MIN_SIZE else None
+    etag = f'{cached.etag[:-1]}-{encoding}"' if encoding else cached.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    if encoding is None:
+        return Response(content=cached.body, media_type="application/json", headers=headers)
+
+    variant = email_cache.get_variant(key, encoding)
+    if variant is None:
+        variant = CachedResponse(compress(cached.body, encoding), etag)
+        email_cache.put_variant(key, encoding, variant, generation)
+    headers["Content-Encoding"] = encoding
+    return Response(content=variant.body, media_type="application/json", headers=headers)
+
+
+def _list_tags(mailbox_id: str, filter: str, data) -> list[str]:
+    """Cache tags for a list response: its mailbox, its filter and every email
+    it shows."""
+    emails = data["emails"] if isinstance(data, dict) else data
+    return [f"mailbox:{mailbox_id}", f"{mailbox_id}:filter:{filter}"] + [
+        f"{mailbox_id}:email:{email['id']}" for email in emails
+    ]
+
+
+def _flag_tags(
+    mailbox_id: str, is_read: Optional[bool], is_archived: Optional[bool]
+) -> list[str]:
+    """Cache tags of list filters whose membership a flag change can alter."""
+    tags = []
+    if is_read is not None:
+        tags.append(f"{mailbox_id}:filter:unread")
+    if is_archived is not None:
+        tags.append(f"{mailbox_id}:filter:archived")
+    return tags
+
+
+def _change_event(change: dict) -> Event:
+    """Event for one `_email_changes` entry (used to replay missed events)."""
+    data: dict = {"ids": [change["id"]]}
+    if change["op"] == "update":
+        data["fields"] = change["fields"]
+    return Event(change["seq"], CHANGE_EVENT_TYPES[change["op"]], data)
+
+
+def _fts_query(q: str) -> str:
+    """Turn free text into an FTS5 query: every term must match, last as a prefix."""
+    terms = ['"' + term.replace('"', '""') + '"' for term in q.split()]
+    if terms:
+        terms[-1] += "*"
+    return " AND ".join(terms)
+
+
+# --------------- Queries ---------------
+# Blocking database work; route handlers run these on the database executor.
+
+def _mailbox_version(cursor) -> int:
+    """Current mailbox change version (bumped by triggers on every write)."""
+    cursor.execute("SELECT version FROM mailbox_version")
+    return cursor.fetchone()[0]
+
+
+def _new_change_seq(cursor, before: int) -> Optional[int]:
+    """Seq of the latest change logged since `before` was read in the same
+    write transaction, or None if the writes logged nothing (e.g. a flag
+    set to the value it already had)."""
+    seq = latest_change_seq(cursor)
+    return seq if seq > before else None
+
+
+def _list_emails(
+    mailbox_id: str, filter: str, limit: Optional[int], cursor: Optional[str], fields: str
+):
+    """Select a full list or a keyset page of emails.
+
+    Returns the response data and the mailbox version it was read at.
+    """
+    if fields not in ("full", "summary"):
+        raise HTTPException(status_code=400, detail="fields must be 'full' or 'summary'")
+    summary = fields == "summary"
+    columns = SUMMARY_COLUMNS if summary else EMAIL_COLUMNS
+    tables = "emails" if summary else EMAIL_TABLES
+    convert = _row_to_summary if summary else _row_to_email
+    where = FILTER_CLAUSES.get(filter, FILTER_CLAUSES["all"])
+    paginated = limit is not None or cursor is not None
+    position = decode_cursor(cursor) if cursor else None
+    page_size = limit or 50
 
-@router.get("")
-def list_emails(filter: str = "all"):
-    """Fetch all emails with optional filter."""
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
+        with get_db(mailbox_id) as conn:
+            cur = conn.cursor()
+            # Read the rows and the mailbox version from one snapshot
+            cur.execute("BEGIN")
 
-            if filter == "unread":
-                cursor.execute(
-                    "SELECT * FROM emails WHERE is_read = 0 ORDER BY date DESC"
+            if not paginated:
+                cur.execute(
+                    f"SELECT {columns} FROM {tables} WHERE {where} "
+                    "ORDER BY date DESC, id DESC"
                 )
-            elif filter == "archived":
-                cursor.execute(
-                    "SELECT * FROM emails WHERE is_archived = 1 ORDER BY date DESC"
+                data = [convert(row) for row in cur.fetchall()]
+                return data, _mailbox_version(cur)
+
+            params: list = []
+            if position is not None:
+                where += " AND (date, id) < (?, ?)"
+                params.extend(position)
+            # Fetch one extra row to know whether another page exists
+            params.append(page_size + 1)
+            cur.execute(
+                f"""SELECT {columns} FROM {tables} WHERE {where}
+                    ORDER BY date DESC, id DESC LIMIT ?""",
+                params,
+            )
+            rows = cur.fetchall()
+
+            next_cursor = None
+            if len(rows) > page_size:
+                rows = rows[:page_size]
+                last = rows[-1]
+                next_cursor = encode_cursor(last["date"], last["id"])
+
+            data = {
+                "emails": [convert(row) for row in rows],
+                "next_cursor": next_cursor,
+            }
+            return data, _mailbox_version(cur)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+def _search_emails(
+    mailbox_id: str, q: str, filter: str, limit: int, cursor: Optional[str]
+):
+    """Select a BM25-ranked page of FTS matches with snippets."""
+    match = _fts_query(q)
+    if not match:
+        raise HTTPException(status_code=400, detail="Search query is empty")
+    where = FILTER_CLAUSES.get(filter, FILTER_CLAUSES["all"])
+    position = decode_cursor(cursor, (float, str)) if cursor else None
+
+    try:
+        with get_db(mailbox_id) as conn:
+            cur = conn.cursor()
+
+            params: list = [match]
+            if position is not None:
+                where += " AND (m.score, emails.id) > (?, ?)"
+                params.extend(position)
+            params.append(limit + 1)
+            # Weights: subject, body, sender_name, sender_email, attachment_names
+            cur.execute(
+                f"""SELECT {SUMMARY_COLUMNS}, emails.rowid AS fts_rowid, m.score
+                    FROM (
+                        SELECT rowid, bm25(emails_fts, 10.0, 1.0, 5.0, 5.0, 3.0) AS score
+                        FROM emails_fts WHERE emails_fts MATCH ?
+                    ) AS m
+                    JOIN emails ON emails.rowid = m.rowid
+                    WHERE {where}
+                    ORDER BY m.score, emails.id LIMIT ?""",
+                params,
+            )
+            rows = cur.fetchall()
+
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                last = rows[-1]
+                next_cursor = encode_cursor(last["score"], last["id"])
+
+            # Snippets are only built for the rows on this page
+            snippets: dict = {}
+            if rows:
+                rowids = [row["fts_rowid"] for row in rows]
+                cur.execute(
+                    f"""SELECT rowid, snippet(emails_fts, -1, '<mark>', '</mark>', '…', 16)
+                        FROM emails_fts
+                        WHERE emails_fts MATCH ?
+                          AND rowid IN ({", ".join("?" * len(rowids))})""",
+                    [match, *rowids],
                 )
-            else:
-                cursor.execute("SELECT * FROM emails ORDER BY date DESC")
+                snippets = {rowid: snippet for rowid, snippet in cur.fetchall()}
+
+            results = []
+            for row in rows:
+                result = _row_to_summary(row)
+                result["snippet"] = snippets.get(row["fts_rowid"], "")
+                results.append(result)
 
-            rows = cursor.fetchall()
-            return [_row_to_email(row) for row in rows]
+            return {"emails": results, "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-@router.get("/{email_id}")
-def get_email(email_id: str):
-    """Fetch a single email by ID."""
+def _get_email(mailbox_id: str, email_id: str):
+    """Select a single email by ID, returning it with its version."""
     try:
-        with get_db() as conn:
+        with get_db(mailbox_id) as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM emails WHERE id = ?", (email_id,))
+            cursor.execute(
+                f"SELECT {EMAIL_COLUMNS} FROM {EMAIL_TABLES} WHERE emails.id = ?", (email_id,)
+            )
             row = cursor.fetchone()
             if row is None:
                 raise HTTPException(status_code=404, detail="Email not found")
-            return _row_to_email(row)
+            return _row_to_email(row), row["version"]
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-@router.post("", status_code=201)
-def create_email(email: EmailCreate):
-    """Create / send a new email."""
+def _link_attachments(cursor, email_id: str, urls: list[str]) -> None:
+    """Link uploaded attachments (url ".../attachments/<id>") to an email;
+    ones already linked to another email are left alone."""
+    uploaded = [url.rsplit("/", 1)[-1] for url in urls if "/attachments/" in url]
+    if uploaded:
+        cursor.execute(
+            f"""UPDATE attachments SET email_id = ?
+                WHERE email_id IS NULL AND id IN ({", ".join("?" * len(uploaded))})""",
+            [email_id, *uploaded],
+        )
+
+
+def _create_email(mailbox_id: str, email: EmailCreate):
+    """Insert a new sent email; returns it with the change seq of the insert."""
     try:
         new_id = str(uuid.uuid4())[:8]
+        sender = email.sender.model_dump() if email.sender else DEFAULT_SENDER
         now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
-        preview = email.body[:80] + "..." if len(email.body) > 80 else email.body
         attachments_json = json.dumps(
             [a.model_dump() for a in email.attachments]
         )
 
-        with get_db() as conn:
+        with get_db(mailbox_id) as conn:
             cursor = conn.cursor()
             cursor.execute(
-                """INSERT INTO emails
-                   (id, sender_name, sender_email, sender_avatar,
-                    recipient_name, recipient_email,
-                    subject, preview, body, date, is_read, is_archived, attachments)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    new_id,
-                    "Richard Brown",
-                    "richard@example.com",
-                    "",
-                    email.recipient.name,
-                    email.recipient.email,
-                    email.subject,
-                    preview,
-                    email.body,
-                    now,
-                    1,   # sent emails are read
-                    0,
-                    attachments_json,
-                ),
+                INSERT_EMAIL_SQL,
+                {
+                    "id": new_id,
+                    "sender_name": sender["name"],
+                    "sender_email": sender["email"],
+                    "sender_avatar": "",
+                    "recipient_name": email.recipient.name,
+                    "recipient_email": email.recipient.email,
+                    "subject": email.subject,
+                    "preview": make_preview(email.body),
+                    "body": email.body,
+                    "date": now,
+                    "is_read": 1,   # sent emails are read
+                    "is_archived": 0,
+                    "attachments": attachments_json,
+                    "message_id": _make_message_id(sender["email"]),
+                    "in_reply_to": email.in_reply_to,
+                },
             )
+            _link_attachments(cursor, new_id, [a.url for a in email.attachments])
 
-        return {
-            "id": new_id,
-            "sender": {
-                "name": "Richard Brown",
-                "email": "richard@example.com",
-                "avatar": "",
-            },
-            "recipient": {
-                "name": email.recipient.name,
-                "email": email.recipient.email,
-            },
-            "subject": email.subject,
-            "preview": preview,
-            "body": email.body,
-            "date": now,
-            "is_read": True,
-            "is_archived": False,
-            "attachments": [a.model_dump() for a in email.attachments],
-        }
+            # Moves the body out of emails once the search index has it
+            move_bodies(cursor, "id = ?", (new_id,))
+
+            cursor.execute(
+                f"SELECT {EMAIL_COLUMNS} FROM {EMAIL_TABLES} WHERE emails.id = ?", (new_id,)
+            )
+            return _row_to_email(cursor.fetchone()), latest_change_seq(cursor)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-@router.put("/{email_id}")
-def update_email(email_id: str, updates: EmailUpdate):
-    """Update an existing email (mark as read, archive, etc.)."""
+def _update_email(mailbox_id: str, email_id: str, updates: EmailUpdate):
+    """Apply a partial update to an email.
+
+    Returns the updated email and the change seq of the update (None when
+    nothing changed).
+    """
     try:
-        with get_db() as conn:
+        with get_db(mailbox_id) as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM emails WHERE id = ?", (email_id,))
+            # Write lock first, so no other writer's change lands after `before`
+            cursor.execute("BEGIN IMMEDIATE")
+            before = latest_change_seq(cursor)
+            cursor.execute(
+                f"SELECT {EMAIL_COLUMNS} FROM {EMAIL_TABLES} WHERE emails.id = ?", (email_id,)
+            )
             row = cursor.fetchone()
             if row is None:
                 raise HTTPException(status_code=404, detail="Email not found")
@@ -187,9 +613,10 @@ def update_email(email_id: str, updates: EmailUpdate):
             if updates.subject is not None:
                 fields.append("subject = ?")
                 values.append(updates.subject)
-            if updates.body is not None:
-                fields.append("body = ?")
-                values.append(updates.body)
+            body_changed = updates.body is not None and updates.body != row_body(row)
+            if body_changed:
+                fields.append("preview = ?")
+                values.append(make_preview(updates.body))
 
             if fields:
                 values.append(email_id)
@@ -197,27 +624,592 @@ def update_email(email_id: str, updates: EmailUpdate):
                     f"UPDATE emails SET {', '.join(fields)} WHERE id = ?",
                     values,
                 )
+            if body_changed:
+                update_body(cursor, email_id, updates.body)
+            seq = _new_change_seq(cursor, before)
 
-            cursor.execute("SELECT * FROM emails WHERE id = ?", (email_id,))
+            cursor.execute(
+                f"SELECT {EMAIL_COLUMNS} FROM {EMAIL_TABLES} WHERE emails.id = ?", (email_id,)
+            )
             updated_row = cursor.fetchone()
-            return _row_to_email(updated_row)
+            return _row_to_email(updated_row), seq
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-@router.delete("/{email_id}", status_code=204)
-def delete_email(email_id: str):
-    """Delete an email."""
+def _delete_email(mailbox_id: str, email_id: str):
+    """Delete an email by ID; returns the change seq of the delete."""
     try:
-        with get_db() as conn:
+        with get_db(mailbox_id) as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT id FROM emails WHERE id = ?", (email_id,))
             if cursor.fetchone() is None:
                 raise HTTPException(status_code=404, detail="Email not found")
             cursor.execute("DELETE FROM emails WHERE id = ?", (email_id,))
+            return latest_change_seq(cursor)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+def _export_emails(mailbox_id: str, filter: str, gzip_output: bool):
+    """Yield the mailbox as NDJSON chunks, optionally gzip-compressed.
+
+    Rows are pulled with fetchmany() from a single statement, so memory stays
+    bounded by EXPORT_CHUNK_SIZE and the export reads one consistent snapshot.
+    """
+    where = FILTER_CLAUSES.get(filter, FILTER_CLAUSES["all"])
+    compressor = zlib.compressobj(wbits=31) if gzip_output else None  # 31 = gzip
+
+    with get_db(mailbox_id) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT {EMAIL_COLUMNS} FROM {EMAIL_TABLES} WHERE {where} "
+            "ORDER BY date DESC, id DESC"
+        )
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            if not rows:
+                break
+            chunk = b"".join(dumps(_row_to_email(row)) + b"\n" for row in rows)
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+                if not chunk:
+                    continue
+            yield chunk
+
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def _import_row(email: EmailImport, now: str) -> dict:
+    """INSERT_EMAIL_SQL parameters for an imported email."""
+    return {
+        # Full UUIDs: 8-char ids would collide at import scale
+        "id": email.id or uuid.uuid4().hex,
+        "sender_name": email.sender.name,
+        "sender_email": email.sender.email,
+        "sender_avatar": "",
+        "recipient_name": email.recipient.name,
+        "recipient_email": email.recipient.email,
+        "subject": email.subject,
+        "preview": email.preview if email.preview is not None else make_preview(email.body),
+        "body": email.body,
+        "date": email.date or now,
+        "is_read": int(email.is_read),
+        "is_archived": int(email.is_archived),
+        "attachments": json.dumps([a.model_dump() for a in email.attachments]),
+        "message_id": email.message_id or _make_message_id(email.sender.email),
+        "in_reply_to": email.in_reply_to,
+    }
+
+
+def _insert_import_batch(mailbox_id: str, rows: list[dict]) -> tuple[list[str], int]:
+    """Insert one import batch in a single transaction.
+
+    Rows whose id already exists are skipped; inserted ones get their
+    uploaded attachments linked, as on create. Returns the ids actually
+    inserted and the change seq after the batch.
+    """
+    sql = INSERT_EMAIL_SQL.replace("INSERT INTO", "INSERT OR IGNORE INTO")
+    try:
+        with get_db(mailbox_id) as conn:
+            cursor = conn.cursor()
+            # Row by row: executemany only reports the total rowcount
+            inserted = []
+            for row in rows:
+                cursor.execute(sql, row)
+                if cursor.rowcount:
+                    inserted.append(row["id"])
+                    attachments = json.loads(row["attachments"])
+                    _link_attachments(cursor, row["id"], [a["url"] for a in attachments])
+            if inserted:
+                move_bodies(
+                    cursor, f"id IN ({', '.join('?' * len(inserted))})", tuple(inserted)
+                )
+            return inserted, latest_change_seq(cursor)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+async def _request_lines(request: Request):
+    """Yield (line_number, line) from a streamed request body."""
+    buffer = b""
+    line_number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            yield line_number, line
+        if len(buffer) > MAX_IMPORT_LINE_BYTES:
+            raise ValueError(f"line {line_number + 1} exceeds {MAX_IMPORT_LINE_BYTES} bytes")
+    if buffer:
+        yield line_number + 1, buffer
+
+
+async def _import_emails(mailbox_id: str, request: Request, batch_size: int) -> dict:
+    """Validate and insert a streamed NDJSON body batch by batch.
+
+    Only the current batch is held in memory. Returns totals, the number of
+    committed batches and the first MAX_IMPORT_ERRORS line errors.
+    """
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+    totals = {"lines": 0, "imported": 0, "skipped": 0, "failed": 0, "batches": 0}
+    errors: list[dict] = []
+    rows: list[dict] = []
+
+    async def flush():
+        inserted, seq = await run_db(_insert_import_batch, mailbox_id, rows)
+        if inserted:
+            email_events.publish(mailbox_id, Event(seq, "created", {"ids": inserted}))
+        totals["imported"] += len(inserted)
+        totals["skipped"] += len(rows) - len(inserted)
+        totals["batches"] += 1
+        rows.clear()
+        email_cache.invalidate(f"mailbox:{mailbox_id}")
+
+    try:
+        async for line_number, line in _request_lines(request):
+            if not line.strip():
+                continue
+            totals["lines"] += 1
+            try:
+                rows.append(_import_row(EmailImport.model_validate_json(line), now))
+            except ValidationError as e:
+                totals["failed"] += 1
+                if len(errors) < MAX_IMPORT_ERRORS:
+                    message = "; ".join(
+                        f"{'.'.join(map(str, err['loc'])) or 'line'}: {err['msg']}"
+                        for err in e.errors()
+                    )
+                    errors.append({"line": line_number, "error": message})
+            if len(rows) >= batch_size:
+                await flush()
+        if rows:
+            await flush()
+    except (ValueError, HTTPException) as e:
+        # Batches committed so far are kept; report where the import stopped
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        errors.append({"line": None, "error": f"Import aborted: {detail}"})
+
+    return {**totals, "errors": errors}
+
+
+async def _event_stream(mailbox_id: str, last_event_id: Optional[int]):
+    """Yield SSE messages for one client until it disconnects.
+
+    The client is subscribed before missed events are replayed from the change
+    log, so nothing published in between is lost; live events already covered
+    by the replay (ids up to its last seq) are skipped. Live events are not
+    deduplicated against each other: writes publish after they commit, so two
+    concurrent ones can arrive out of seq order.
+    """
+    subscription = email_events.subscribe(mailbox_id)
+    replayed = 0  # last seq sent by the replay
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n".encode()
+        if last_event_id is not None:
+            try:
+                page = await run_db(_email_changes, mailbox_id, last_event_id, MAX_PAGE_SIZE)
+            except HTTPException as e:
+                if e.status_code != 410:
+                    raise
+                # Missed changes were pruned; /changes answers 410 and the
+                # client reloads
+                page = {"changes": [], "next_since": last_event_id, "has_more": True}
+            for change in page["changes"]:
+                yield _change_event(change).encode()
+            replayed = subscription.last_id = page["next_since"]
+            if page["has_more"]:
+                # Too far behind to replay; the client catches up via /changes
+                yield Event(page["next_since"], "resync", {"since": last_event_id}).encode()
+
+        while True:
+            try:
+                event = await subscription.get(SSE_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield b": heartbeat\n\n"
+                continue
+            if event is None:  # server shutting down
+                return
+            if event.type != "resync" and event.id <= replayed:
+                continue
+            subscription.last_id = event.id
+            yield event.encode()
+    finally:
+        email_events.unsubscribe(subscription)
+
+
+def _email_counts(mailbox_id: str):
+    """Read the trigger-maintained mailbox counters."""
+    try:
+        with get_db(mailbox_id) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT total, unread, archived FROM mailbox_counters")
+            row = cursor.fetchone()
+            return {
+                "total": row["total"],
+                "unread": row["unread"],
+                "archived": row["archived"],
+            }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+def _email_changes(mailbox_id: str, since: int, limit: int):
+    """Read up to `limit` change-log entries after `since`, collapsed to the
+    net change of each email (in order of its last change in the page).
+
+    Raises 410 when entries after `since` have been pruned.
+    """
+    try:
+        with get_db(mailbox_id) as conn:
+            cursor = conn.cursor()
+            # Read the log page and the current rows from one snapshot
+            cursor.execute("BEGIN")
+            horizon = change_horizon(cursor)
+            if since < horizon:
+                raise HTTPException(
+                    status_code=410,
+                    detail=f"Changes up to seq {horizon} have been pruned; reload the mailbox",
+                )
+            cursor.execute(
+                """SELECT seq, email_id, op, fields FROM email_changes
+                   WHERE seq > ? ORDER BY seq LIMIT ?""",
+                (since, limit + 1),
+            )
+            log = cursor.fetchall()
+            has_more = len(log) > limit
+            log = log[:limit]
+
+            net: dict[str, dict] = {}
+            for entry in log:
+                # An update keeps an earlier insert in the page an insert
+                change = net.pop(entry["email_id"], {"op": "update", "fields": set()})
+                if entry["op"] == "update":
+                    change["fields"].update(json.loads(entry["fields"]))
+                else:
+                    change = {"op": entry["op"], "fields": set()}
+                change["seq"] = entry["seq"]
+                net[entry["email_id"]] = change
+
+            live = [email_id for email_id, change in net.items() if change["op"] != "delete"]
+            emails = {}
+            if live:
+                cursor.execute(
+                    f"""SELECT {EMAIL_COLUMNS} FROM {EMAIL_TABLES}
+                        WHERE emails.id IN ({', '.join('?' * len(live))})""",
+                    live,
+                )
+                emails = {row["id"]: _row_to_email(row) for row in cursor.fetchall()}
+
+            changes = []
+            for email_id, change in net.items():
+                result = {"seq": change["seq"], "id": email_id, "op": change["op"]}
+                email = emails.get(email_id)
+                if email is None:
+                    # Deleted later in the log; report the current state
+                    result["op"] = "delete"
+                elif change["op"] == "insert":
+                    result["email"] = email
+                else:
+                    result["fields"] = {name: email[name] for name in sorted(change["fields"])}
+                changes.append(result)
+
+            return {
+                "changes": changes,
+                "next_since": log[-1]["seq"] if log else since,
+                "has_more": has_more,
+            }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+def _batch_emails(mailbox_id: str, batch: EmailBatch):
+    """Apply one flag update or delete to many emails in a single transaction.
+
+    Returns the per-id results and the change seq of the batch (None when
+    nothing changed).
+    """
+    ids = list(dict.fromkeys(batch.ids))  # de-duplicate, keep request order
+    placeholders = ", ".join("?" * len(ids))
+    try:
+        with get_db(mailbox_id) as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            before = latest_change_seq(cursor)
+            cursor.execute(
+                f"SELECT id FROM emails WHERE id IN ({placeholders})", ids
+            )
+            found = {row["id"] for row in cursor.fetchall()}
+
+            if batch.delete:
+                cursor.execute(
+                    f"DELETE FROM emails WHERE id IN ({placeholders})", ids
+                )
+                status = "deleted"
+            else:
+                fields: list[str] = []
+                values: list = []
+                if batch.is_read is not None:
+                    fields.append("is_read = ?")
+                    values.append(int(batch.is_read))
+                if batch.is_archived is not None:
+                    fields.append("is_archived = ?")
+                    values.append(int(batch.is_archived))
+                cursor.execute(
+                    f"UPDATE emails SET {', '.join(fields)} WHERE id IN ({placeholders})",
+                    values + ids,
+                )
+                status = "updated"
+            seq = _new_change_seq(cursor, before)
+
+        return {
+            "results": [
+                {"id": email_id, "status": status if email_id in found else "not_found"}
+                for email_id in ids
+            ]
+        }, seq
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+# --------------- Routes ---------------
+# Mounted at /emails (default mailbox) and /mailboxes/{mailbox_id}/emails.
+
+@router.get("", response_model=EmailList)
+async def list_emails(
+    filter: str = "all",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: str = "full",
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    mailbox_id: str = Depends(get_synced_mailbox_id),
+):
+    """Fetch emails with optional filter.
+
+    Without `limit`/`cursor` the whole list is returned. With either, a page
+    of at most `limit` emails is returned along with a `next_cursor` to pass
+    back for the following page (keyset pagination on date, id).
+
+    `fields=summary` returns `EmailSummary` objects without body/attachments.
+
+    Responses carry an ETag derived from the mailbox version; a matching
+    `If-None-Match` gets `304 Not Modified`.
+    """
+    if filter not in FILTER_CLAUSES:
+        filter = "all"
+    key = f"{mailbox_id}:list:{filter}:{fields}:{limit}:{cursor}"
+    generation = email_cache.generation
+    cached = email_cache.get(key)
+    if cached is None:
+        data, version = await run_db(_list_emails, mailbox_id, filter, limit, cursor, fields)
+        cached = CachedResponse(encode_response(data, EmailList), f'"m{version}"')
+        email_cache.put(key, cached, _list_tags(mailbox_id, filter, data), generation)
+    return _conditional_response(key, cached, generation, if_none_match, accept_encoding)
+
+
+@router.get("/search", response_model=SearchPage)
+async def search_emails(
+    q: str = Query(..., min_length=1),
+    filter: str = "all",
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    mailbox_id: str = Depends(get_synced_mailbox_id),
+):
+    """Full-text search over subject, body, sender and attachment names.
+
+    Results are `EmailSummary` objects ranked by BM25 (best first), each with a
+    highlighted `snippet`, and paginated like the list endpoint via
+    `next_cursor`.
+    """
+    return json_response(await run_db(_search_emails, mailbox_id, q, filter, limit, cursor))
+
+
+@router.get("/counts", response_model=EmailCounts)
+async def email_counts(mailbox_id: str = Depends(get_synced_mailbox_id)):
+    """Total, unread and archived email counts for the tab badges."""
+    return json_response(await run_db(_email_counts, mailbox_id))
+
+
+@router.get("/changes", response_model=EmailChanges, response_model_exclude_unset=True)
+async def email_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    mailbox_id: str = Depends(get_synced_mailbox_id),
+):
+    """Incremental sync: what changed since change sequence number `since`.
+
+    Returns one entry per changed email with its net `op`: `insert` (with the
+    full `email`), `update` (with the changed `fields` and their current
+    values) or `delete`. Pass `next_since` back as `since` to continue; while
+    `has_more` is true another page is waiting. `since=0` replays the whole
+    mailbox until the log is pruned (EMAIL_CHANGES_RETENTION); a `since`
+    from before the pruned entries gets `410 Gone`.
+    """
+    return json_response(await run_db(_email_changes, mailbox_id, since, limit))
+
+
+@router.get("/events")
+async def email_event_stream(
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    mailbox_id: str = Depends(get_mailbox_id),
+):
+    """Server-Sent Events stream of mailbox changes.
+
+    Pushes `created`, `updated` and `deleted` events (`data` holds the email
+    `ids`, plus the changed `fields` for updates) as the write endpoints
+    commit them. Event ids are change-log sequence numbers: a reconnect with
+    `Last-Event-ID` first replays what was missed. A client that falls too far
+    behind gets a `resync` event and should call `GET /emails/changes` with
+    its `since`. A comment line is sent as heartbeat when idle.
+    """
+    try:
+        resume_from = int(last_event_id) if last_event_id else None
+    except ValueError:
+        resume_from = None
+    return StreamingResponse(
+        _event_stream(mailbox_id, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/export")
+async def export_emails(
+    filter: str = "all",
+    gzip: bool = False,
+    mailbox_id: str = Depends(get_synced_mailbox_id),
+):
+    """Stream every email matching `filter` as newline-delimited JSON.
+
+    With `gzip=true` the stream is a gzip file (`emails.ndjson.gz`).
+    """
+    if gzip:
+        media_type, filename = "application/gzip", "emails.ndjson.gz"
+    else:
+        media_type, filename = "application/x-ndjson", "emails.ndjson"
+    return StreamingResponse(
+        iterate_db(_export_emails(mailbox_id, filter, gzip)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_emails(
+    request: Request,
+    batch_size: int = Query(IMPORT_BATCH_SIZE, ge=1, le=50_000),
+    mailbox_id: str = Depends(get_new_mailbox_id),
+):
+    """Bulk-import emails from a streamed NDJSON body.
+
+    Each line is an email (the `/emails/export` format is accepted); lines are
+    validated as they arrive and inserted `batch_size` rows per transaction,
+    so the payload is never held in memory. Returns totals and per-line
+    errors. Emails whose id already exists are skipped.
+    """
+    return json_response(await _import_emails(mailbox_id, request, batch_size))
+
+
+@router.post("/batch", response_model=BatchResult)
+async def batch_emails(batch: EmailBatch, mailbox_id: str = Depends(get_synced_mailbox_id)):
+    """Mark read/unread, archive/unarchive or delete many emails at once.
+
+    All ids are handled in one transaction; each gets a per-id status of
+    `updated`, `deleted` or `not_found`.
+    """
+    result, seq = await run_db(_batch_emails, mailbox_id, batch)
+    changed = [item["id"] for item in result["results"] if item["status"] != "not_found"]
+    if seq is not None:
+        if batch.delete:
+            event = Event(seq, "deleted", {"ids": changed})
+        else:
+            fields = batch.model_dump(include={"is_read", "is_archived"}, exclude_none=True)
+            event = Event(seq, "updated", {"ids": changed, "fields": fields})
+        email_events.publish(mailbox_id, event)
+    email_cache.invalidate(
+        *[f"{mailbox_id}:email:{email_id}" for email_id in batch.ids],
+        *_flag_tags(mailbox_id, batch.is_read, batch.is_archived),
+    )
+    return json_response(result)
+
+
+@router.get("/{email_id}", response_model=Email)
+async def get_email(
+    email_id: str,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    mailbox_id: str = Depends(get_synced_mailbox_id),
+):
+    """Fetch a single email by ID.
+
+    Responses carry an ETag of the email's version; a matching
+    `If-None-Match` gets `304 Not Modified`.
+    """
+    key = f"{mailbox_id}:email:{email_id}"
+    generation = email_cache.generation
+    cached = email_cache.get(key)
+    if cached is None:
+        data, version = await run_db(_get_email, mailbox_id, email_id)
+        cached = CachedResponse(encode_response(data, Email), f'"{email_id}.{version}"')
+        email_cache.put(key, cached, [key, f"mailbox:{mailbox_id}"], generation)
+    return _conditional_response(key, cached, generation, if_none_match, accept_encoding)
+
+
+@router.post("", status_code=201, response_model=Email)
+async def create_email(email: EmailCreate, mailbox_id: str = Depends(get_new_mailbox_id)):
+    """Create / send a new email."""
+    created, seq = await run_db(_create_email, mailbox_id, email)
+    email_cache.invalidate(f"{mailbox_id}:filter:all")
+    email_events.publish(mailbox_id, Event(seq, "created", {"ids": [created["id"]]}))
+    return json_response(created, status_code=201)
+
+
+@router.put("/{email_id}", response_model=Email)
+async def update_email(
+    email_id: str, updates: EmailUpdate, mailbox_id: str = Depends(get_mailbox_id)
+):
+    """Update an existing email (mark as read, archive, etc.).
+
+    With FLAG_WRITE_BEHIND, updates that only set `is_read`/`is_archived` are
+    queued and committed with others in one transaction shortly after; the
+    response already reflects them.
+    """
+    fields = updates.model_dump(exclude_none=True)
+    if FLAG_WRITE_BEHIND and fields and fields.keys() <= {"is_read", "is_archived"}:
+        # Taken before the read: a flush may commit while it runs
+        accepted = flag_writes.pending(mailbox_id, email_id)
+        email, _ = await run_db(_get_email, mailbox_id, email_id)
+        flag_writes.queue(mailbox_id, email_id, fields)
+        email.update({**accepted, **flag_writes.pending(mailbox_id, email_id)})
+        return json_response(email)
+
+    await get_synced_mailbox_id(mailbox_id)
+    updated, seq = await run_db(_update_email, mailbox_id, email_id, updates)
+    email_cache.invalidate(
+        f"{mailbox_id}:email:{email_id}",
+        *_flag_tags(mailbox_id, updates.is_read, updates.is_archived),
+    )
+    if seq is not None:
+        if "body" in fields:
+            fields["preview"] = updated["preview"]  # regenerated from the body
+        email_events.publish(
+            mailbox_id, Event(seq, "updated", {"ids": [email_id], "fields": fields})
+        )
+    return json_response(updated)
+
+
+@router.delete("/{email_id}", status_code=204)
+async def delete_email(email_id: str, mailbox_id: str = Depends(get_synced_mailbox_id)):
+    """Delete an email."""
+    seq = await run_db(_delete_email, mailbox_id, email_id)
+    email_cache.invalidate(f"{mailbox_id}:email:{email_id}")
+    email_events.publish(mailbox_id, Event(seq, "deleted", {"ids": [email_id]}))
@@ -0,0 +1,47 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.cache import email_cache
+from app.database import shards
+from app.events import email_events
+from app.metrics import expose
+from app.writeback import flag_writes
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"  # charset appended by Starlette
+
+
+def _stats(prefix: str, help: str, values: dict, counters: tuple = ()) -> list[str]:
+    """Export `values` as gauges, except the monotonic `counters`, which are
+    exported as `<name>_total` counters."""
+    lines = []
+    for key, value in values.items():
+        kind = "counter" if key in counters else "gauge"
+        name = f"{prefix}_{key}_total" if kind == "counter" else f"{prefix}_{key}"
+        lines.append(f"# HELP {name} {help} ({key})")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {value}")
+    return lines
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Request, SQL, pool, cache and event-stream metrics in Prometheus format."""
+    extra = (
+        _stats("db_pool", "SQLite connection pools", shards.stats())
+        + _stats(
+            "response_cache",
+            "Email response cache",
+            email_cache.stats(),
+            counters=("hits", "misses", "evictions", "invalidations"),
+        )
+        + _stats("sse", "Email event streams", email_events.stats())
+        + _stats(
+            "flag_write_behind",
+            "Queued flag updates",
+            flag_writes.stats(),
+            counters=("queued", "flushes", "written"),
+        )
+    )
+    return PlainTextResponse(expose(extra), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,134 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+
+from app.database import get_db, run_db
+from app.dependencies import get_synced_mailbox_id
+from app.pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor
+from app.routes.emails import SUMMARY_COLUMNS, EmailSummary, _row_to_summary
+from app.serialization import json_response
+
+router = APIRouter(prefix="/threads", tags=["threads"])
+
+# Thread columns plus the summary of its latest email (joined by primary key)
+THREAD_SELECT = f"""
+    SELECT threads.id AS thread_id, threads.subject AS thread_subject,
+           threads.message_count, threads.unread_count, threads.latest_date,
+           {SUMMARY_COLUMNS}
+    FROM threads
+    JOIN emails ON emails.id = threads.latest_email_id
+"""
+
+
+# --------------- Pydantic Models ---------------
+
+class Thread(BaseModel):
+    id: str
+    subject: str
+    message_count: int
+    unread_count: int
+    latest: EmailSummary
+    emails: Optional[list[EmailSummary]] = None  # only on GET /threads/{id}
+
+
+class ThreadPage(BaseModel):
+    threads: list[Thread]
+    next_cursor: Optional[str]
+
+
+# --------------- Helpers ---------------
+
+def _row_to_thread(row) -> dict:
+    return {
+        "id": row["thread_id"],
+        "subject": row["thread_subject"],
+        "message_count": row["message_count"],
+        "unread_count": row["unread_count"],
+        "latest": _row_to_summary(row),
+    }
+
+
+# --------------- Queries ---------------
+
+def _list_threads(mailbox_id: str, limit: int, cursor: Optional[str], unread: bool):
+    """Select a keyset page of threads, most recently active first."""
+    position = decode_cursor(cursor) if cursor else None
+    try:
+        with get_db(mailbox_id) as conn:
+            cur = conn.cursor()
+            where = "threads.unread_count > 0" if unread else "1 = 1"
+            params: list = []
+            if position is not None:
+                where += " AND (threads.latest_date, threads.id) < (?, ?)"
+                params.extend(position)
+            params.append(limit + 1)
+            cur.execute(
+                f"""{THREAD_SELECT}
+                    WHERE {where}
+                    ORDER BY threads.latest_date DESC, threads.id DESC LIMIT ?""",
+                params,
+            )
+            rows = cur.fetchall()
+
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                last = rows[-1]
+                next_cursor = encode_cursor(last["latest_date"], last["thread_id"])
+
+            return {
+                "threads": [_row_to_thread(row) for row in rows],
+                "next_cursor": next_cursor,
+            }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+def _get_thread(mailbox_id: str, thread_id: str):
+    """Select a thread and the summaries of all its emails, oldest first."""
+    try:
+        with get_db(mailbox_id) as conn:
+            cur = conn.cursor()
+            cur.execute(f"{THREAD_SELECT} WHERE threads.id = ?", (thread_id,))
+            row = cur.fetchone()
+            if row is None:
+                raise HTTPException(status_code=404, detail="Thread not found")
+            thread = _row_to_thread(row)
+
+            cur.execute(
+                f"""SELECT {SUMMARY_COLUMNS} FROM emails
+                    WHERE thread_id = ? ORDER BY date, id""",
+                (thread_id,),
+            )
+            thread["emails"] = [_row_to_summary(r) for r in cur.fetchall()]
+            return thread
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+# --------------- Routes ---------------
+
+@router.get("", response_model=ThreadPage, response_model_exclude_unset=True)
+async def list_threads(
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    unread: bool = False,
+    mailbox_id: str = Depends(get_synced_mailbox_id),
+):
+    """List conversation threads, most recently active first.
+
+    Counts and the latest message come from the maintained `threads` index,
+    not from grouping emails at query time. Paginated with `next_cursor`.
+    """
+    return json_response(await run_db(_list_threads, mailbox_id, limit, cursor, unread))
+
+
+@router.get("/{thread_id}", response_model=Thread)
+async def get_thread(thread_id: str, mailbox_id: str = Depends(get_synced_mailbox_id)):
+    """Fetch a thread with the summaries of its emails in date order."""
+    return json_response(await run_db(_get_thread, mailbox_id, thread_id))
@@ -0,0 +1,75 @@
+import functools
+import json
+import os
+import time
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.metrics import record_serialize
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder produces the same bytes
+    orjson = None
+
+# "fast": routes return pre-encoded bytes (orjson when installed), skipping
+# response-model validation and jsonable_encoder.
+# "standard": routes return plain dicts through FastAPI's default path
+# (jsonable_encoder, response-model validation and serialization); the cached
+# list/detail bodies are built with the same steps in `encode_response`.
+# Switch between them to compare the two in benchmarks.
+JSON_RESPONSE_MODE = os.getenv("JSON_RESPONSE_MODE", "fast")
+
+
+def _dumps(data: Any) -> bytes:
+    if orjson is not None and JSON_RESPONSE_MODE == "fast":
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def dumps(data: Any) -> bytes:
+    """Compact UTF-8 JSON, byte-for-byte what FastAPI's JSONResponse emits."""
+    started = time.perf_counter()
+    body = _dumps(data)
+    record_serialize(time.perf_counter() - started)
+    return body
+
+
+@functools.lru_cache(maxsize=None)
+def _adapter(model: Any) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+def encode_response(data: Any, model: Any) -> bytes:
+    """Encode a route result that is returned as pre-encoded bytes (e.g. from
+    the response cache). In standard mode it first takes FastAPI's default
+    steps: jsonable_encoder, validation against `model`, and serialization
+    of the validated value."""
+    started = time.perf_counter()
+    if JSON_RESPONSE_MODE == "standard":
+        adapter = _adapter(model)
+        data = adapter.dump_python(adapter.validate_python(jsonable_encoder(data)), mode="json")
+    body = _dumps(data)
+    record_serialize(time.perf_counter() - started)
+    return body
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps`."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(data: Any, status_code: int = 200):
+    """Return a route result under the configured JSON_RESPONSE_MODE.
+
+    Routes declare a `response_model` for the schema; in fast mode the data is
+    already in that shape and is encoded once, directly.
+    """
+    if JSON_RESPONSE_MODE == "standard":
+        return data
+    return FastJSONResponse(data, status_code=status_code)
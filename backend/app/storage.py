@@ -0,0 +1,50 @@
+import os
+import tempfile
+from typing import BinaryIO
+
+from app.database import DATABASE_PATH
+
+ATTACHMENTS_DIR = os.getenv(
+    "ATTACHMENTS_DIR",
+    os.path.join(os.path.dirname(DATABASE_PATH) or ".", "attachments"),
+)
+MAX_ATTACHMENT_BYTES = int(os.getenv("MAX_ATTACHMENT_BYTES", str(50 * 1024 * 1024)))
+
+
+class BlobStore:
+    """Content-addressed file store: a blob lives at ``<root>/<sha[:2]>/<sha>``.
+
+    Uploads are written to a temp file in the store (same filesystem) and
+    renamed into place once their hash is known, so identical content is
+    stored once and readers never see partial files.
+    """
+
+    def __init__(self, root: str = ATTACHMENTS_DIR):
+        self.root = root
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def create_temp(self) -> BinaryIO:
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False)
+
+    def commit(self, temp_path: str, sha256: str) -> bool:
+        """Move a finished temp file to its hash path; False if already stored."""
+        target = self.path(sha256)
+        if os.path.exists(target):
+            os.remove(temp_path)
+            return False
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(temp_path, target)
+        return True
+
+    def discard(self, temp_path: str) -> None:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+
+
+blob_store = BlobStore()
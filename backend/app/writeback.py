@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import os
+
+from app.cache import email_cache
+from app.changelog import latest_change_seq
+from app.database import get_db, run_db
+from app.events import Event, email_events
+
+logger = logging.getLogger(__name__)
+
+# Queue is_read / is_archived updates in memory and commit them in groups
+FLAG_WRITE_BEHIND = os.getenv("FLAG_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+FLAG_FLUSH_INTERVAL_MS = int(os.getenv("FLAG_FLUSH_INTERVAL_MS", "50"))
+FLAG_FLUSH_MAX_UPDATES = int(os.getenv("FLAG_FLUSH_MAX_UPDATES", "500"))  # emails
+FLUSH_CHUNK_SIZE = 500  # ids per UPDATE statement
+
+
+def _write_flags(mailbox_id: str, updates: dict[str, dict[str, bool]]) -> list[tuple]:
+    """Apply merged flag updates in one transaction, one UPDATE per distinct
+    set of values. Returns (change seq, ids, fields) for each set that
+    logged a change (sets whose emails already had those values are left
+    out)."""
+    groups: dict[tuple, list[str]] = {}
+    for email_id, fields in updates.items():
+        groups.setdefault(tuple(sorted(fields.items())), []).append(email_id)
+
+    written = []
+    with get_db(mailbox_id) as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        last_seq = latest_change_seq(cursor)
+        for key, ids in groups.items():
+            fields = dict(key)
+            assignments = ", ".join(f"{column} = ?" for column in fields)
+            values = [int(value) for value in fields.values()]
+            for start in range(0, len(ids), FLUSH_CHUNK_SIZE):
+                chunk = ids[start:start + FLUSH_CHUNK_SIZE]
+                cursor.execute(
+                    f"UPDATE emails SET {assignments} WHERE id IN ({', '.join('?' * len(chunk))})",
+                    values + chunk,
+                )
+            seq = latest_change_seq(cursor)
+            if seq > last_seq:
+                written.append((seq, ids, fields))
+                last_seq = seq
+    return written
+
+
+class FlagWriteBuffer:
+    """Write-behind buffer for email flag updates.
+
+    Updates are merged per email id and committed by `run` in a single
+    transaction every `interval` seconds, or sooner once `max_updates` emails
+    are waiting. Readers call `flush(mailbox_id)` first, so a read always
+    sees every update accepted before it. Updates still queued when the
+    process dies are lost, which is why the mode is opt-in.
+    """
+
+    def __init__(
+        self,
+        interval: float = FLAG_FLUSH_INTERVAL_MS / 1000,
+        max_updates: int = FLAG_FLUSH_MAX_UPDATES,
+    ):
+        self.interval = interval
+        self.max_updates = max_updates
+        self._pending: dict[str, dict[str, dict[str, bool]]] = {}
+        self._size = 0  # emails with queued updates, over all mailboxes
+        self._writing: dict[str, dict[str, dict[str, bool]]] = {}  # being flushed
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._queued = asyncio.Event()
+        self._full = asyncio.Event()
+        self.queued = 0
+        self.flushes = 0
+        self.written = 0
+
+    def queue(self, mailbox_id: str, email_id: str, fields: dict[str, bool]) -> None:
+        """Queue flag values for an email."""
+        mailbox = self._pending.setdefault(mailbox_id, {})
+        pending = mailbox.get(email_id)
+        if pending is None:
+            pending = mailbox[email_id] = {}
+            self._size += 1
+        pending.update(fields)
+        self.queued += 1
+        self._queued.set()
+        if self._size >= self.max_updates:
+            self._full.set()
+
+    def pending(self, mailbox_id: str, email_id: str) -> dict[str, bool]:
+        """Flag values accepted for an email but possibly not yet visible to
+        readers (queued, or in a flush that has not committed)."""
+        return {
+            **self._writing.get(mailbox_id, {}).get(email_id, {}),
+            **self._pending.get(mailbox_id, {}).get(email_id, {}),
+        }
+
+    async def flush(self, mailbox_id: str) -> None:
+        """Commit the mailbox's queued updates, waiting for one in progress."""
+        lock = self._locks.get(mailbox_id)
+        if mailbox_id not in self._pending and (lock is None or not lock.locked()):
+            return
+        lock = self._locks.setdefault(mailbox_id, asyncio.Lock())
+        async with lock:
+            updates = self._pending.pop(mailbox_id, None)
+            if not updates:
+                return
+            self._size -= len(updates)
+            self._writing[mailbox_id] = updates
+            try:
+                written = await run_db(_write_flags, mailbox_id, updates)
+            except Exception:
+                # Keep the updates for the next flush, under any queued since
+                mailbox = self._pending.setdefault(mailbox_id, {})
+                for email_id, fields in updates.items():
+                    if email_id not in mailbox:
+                        self._size += 1
+                    mailbox[email_id] = {**fields, **mailbox.get(email_id, {})}
+                self._queued.set()
+                raise
+            finally:
+                del self._writing[mailbox_id]
+            self.flushes += 1
+            self.written += len(updates)
+
+            tags = {f"{mailbox_id}:email:{email_id}" for email_id in updates}
+            for seq, ids, fields in written:
+                if "is_read" in fields:
+                    tags.add(f"{mailbox_id}:filter:unread")
+                if "is_archived" in fields:
+                    tags.add(f"{mailbox_id}:filter:archived")
+                email_events.publish(
+                    mailbox_id, Event(seq, "updated", {"ids": ids, "fields": fields})
+                )
+            email_cache.invalidate(*tags)
+
+    async def flush_all(self) -> None:
+        for mailbox_id in list(self._pending):
+            await self.flush(mailbox_id)
+
+    async def run(self) -> None:
+        """Background flusher started by the app lifespan."""
+        while True:
+            await self._queued.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._queued.clear()
+            self._full.clear()
+            try:
+                await self.flush_all()
+            except Exception:
+                logger.exception("Flushing queued flag updates failed")
+                await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._size,
+            "queued": self.queued,
+            "flushes": self.flushes,
+            "written": self.written,
+        }
+
+
+flag_writes = FlagWriteBuffer()
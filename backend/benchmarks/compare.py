@@ -0,0 +1,52 @@
+"""
+Benchmark Comparison
+
+Prints the latency and throughput change of each operation between two
+result files written by `benchmarks.run --output`.
+
+Usage:
+    python -m benchmarks.compare before.json after.json
+"""
+
+import argparse
+import json
+
+METRICS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def change(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def compare(before: dict, after: dict) -> None:
+    rows = [(name, stats, after["operations"].get(name))
+            for name, stats in before["operations"].items()]
+    rows.append(("total", before["total"], after["total"]))
+    print(f"{'operation':<10} " + " ".join(f"{metric:>24}" for metric in METRICS))
+    for name, old, new in rows:
+        if new is None:
+            continue
+        cells = [
+            f"{old[metric]:>9} → {new[metric]:<9} {change(old[metric], new[metric]):>4}"
+            for metric in METRICS
+        ]
+        print(f"{name:<10} " + " ".join(f"{cell:>24}" for cell in cells))
+    for side in ("client", "server"):
+        old, new = before["peak_rss_kb"][side], after["peak_rss_kb"][side]
+        if old and new:
+            print(f"peak RSS {side}: {old} → {new} KiB ({change(old, new)})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+    compare(load(args.before), load(args.after))
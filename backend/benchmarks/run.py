@@ -0,0 +1,349 @@
+"""
+Email API Benchmark
+
+Drives a weighted, seeded mix of list/detail/update/create/delete requests
+against the email API, either in-process (ASGI, no network) or over HTTP
+against a uvicorn subprocess, and reports latency percentiles, throughput
+and peak RSS. Results can be written as JSON and compared with
+benchmarks/compare.py.
+
+Mailboxes are generated once per size and seed under benchmarks/data/ and
+reused. App settings (EMAIL_CACHE_MAX_BYTES, JSON_RESPONSE_MODE,
+COMPRESSION_ENCODINGS, ...) are taken from the environment as usual.
+
+Usage:
+    python -m benchmarks.run --rows 10000 --requests 5000 --concurrency 8
+    python -m benchmarks.run --mode http --rows 1000000 --output after.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BACKEND_DIR, "benchmarks", "data")
+ID_SAMPLE_SIZE = 10_000  # existing ids sampled for detail/update/delete targets
+DEFAULT_MIX = "list=50,detail=30,update=10,create=5,delete=5"
+LIST_FILTERS = ("all", "unread", "archived")
+SERVER_START_TIMEOUT = 30  # s
+
+
+# --------------- Mailbox ---------------
+
+def mailbox_path(rows: int, seed: int) -> str:
+    return os.path.join(DATA_DIR, f"mailbox-{rows}-{seed}.db")
+
+
+def ensure_mailbox(rows: int, seed: int, regenerate: bool) -> str:
+    """Path of the generated mailbox, generating it in a subprocess (so its
+    memory does not count towards this process's peak RSS) when missing."""
+    path = mailbox_path(rows, seed)
+    if regenerate or not os.path.exists(path):
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.generate", path,
+             "--rows", str(rows), "--seed", str(seed)],
+            cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL,
+        )
+    return path
+
+
+def sample_ids(path: str, rng: random.Random) -> list[str]:
+    """Up to ID_SAMPLE_SIZE ids of existing emails, picked by rowid."""
+    conn = sqlite3.connect(path)
+    max_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM emails").fetchone()[0]
+    rowids = rng.sample(range(1, max_rowid + 1), min(ID_SAMPLE_SIZE, max_rowid))
+    ids = []
+    for start in range(0, len(rowids), 500):
+        chunk = rowids[start:start + 500]
+        ids += [row[0] for row in conn.execute(
+            f"SELECT id FROM emails WHERE rowid IN ({', '.join('?' * len(chunk))})", chunk
+        )]
+    conn.close()
+    return ids
+
+
+# --------------- Operations ---------------
+# Each takes the client, the shared id pool and the run's RNG and returns the
+# response status.
+
+async def op_list(client: httpx.AsyncClient, ids: list, rng: random.Random) -> int:
+    params = {"limit": 50, "fields": "summary", "filter": rng.choice(LIST_FILTERS)}
+    return (await client.get("/emails", params=params)).status_code
+
+
+async def op_detail(client: httpx.AsyncClient, ids: list, rng: random.Random) -> int:
+    return (await client.get(f"/emails/{rng.choice(ids)}")).status_code
+
+
+async def op_update(client: httpx.AsyncClient, ids: list, rng: random.Random) -> int:
+    body = {"is_read": rng.random() < 0.5}
+    return (await client.put(f"/emails/{rng.choice(ids)}", json=body)).status_code
+
+
+async def op_create(client: httpx.AsyncClient, ids: list, rng: random.Random) -> int:
+    body = {
+        "recipient": {"name": "Jane Doe", "email": "jane.doe@business.com"},
+        "subject": f"Benchmark {rng.getrandbits(32):08x}",
+        "body": "Hi Jane,\n\nThis email was sent by the benchmark.\n\nBest,\nRichard",
+    }
+    response = await client.post("/emails", json=body)
+    if response.status_code == 201:
+        ids.append(response.json()["id"])
+    return response.status_code
+
+
+async def op_delete(client: httpx.AsyncClient, ids: list, rng: random.Random) -> int:
+    if len(ids) <= 1:
+        return 204
+    index = rng.randrange(len(ids))
+    ids[index], ids[-1] = ids[-1], ids[index]
+    return (await client.delete(f"/emails/{ids.pop()}")).status_code
+
+
+OPERATIONS = {
+    "list": op_list,
+    "detail": op_detail,
+    "update": op_update,
+    "create": op_create,
+    "delete": op_delete,
+}
+
+
+def parse_mix(mix: str) -> dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise SystemExit(f"Unknown operation in --mix: {name!r}")
+        weights[name.strip()] = int(weight or 1)
+    return weights
+
+
+# --------------- Targets ---------------
+
+@asynccontextmanager
+async def in_process_client(database_path: str):
+    """Client calling the ASGI app directly, with its lifespan running."""
+    os.environ["DATABASE_PATH"] = database_path
+    sys.path.insert(0, BACKEND_DIR)
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            yield client, None
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def http_client(database_path: str, url: Optional[str]):
+    """Client for a running server at `url`, or for a uvicorn subprocess
+    serving `database_path` when no url is given."""
+    server = None
+    if url is None:
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--port", str(port), "--log-level", "warning", "--no-access-log"],
+            cwd=BACKEND_DIR,
+            env={**os.environ, "DATABASE_PATH": database_path},
+            stdout=subprocess.DEVNULL,
+        )
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    try:
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+            deadline = time.monotonic() + SERVER_START_TIMEOUT
+            while True:
+                try:
+                    (await client.get("/health")).raise_for_status()
+                    break
+                except httpx.TransportError:
+                    if time.monotonic() > deadline or (server and server.poll() is not None):
+                        raise SystemExit(f"Server at {url} did not start")
+                    await asyncio.sleep(0.1)
+            yield client, server
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+def peak_rss_kb(pid: Optional[int] = None) -> Optional[int]:
+    """Peak resident set size in KiB of this process or of `pid` (Linux)."""
+    if pid is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+# --------------- Runner ---------------
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    values = sorted(latencies)
+
+    def to_ms(seconds: float) -> float:
+        return round(seconds * 1000, 3)
+
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": to_ms(sum(values) / len(values)) if values else 0.0,
+        "p50_ms": to_ms(percentile(values, 50)),
+        "p95_ms": to_ms(percentile(values, 95)),
+        "p99_ms": to_ms(percentile(values, 99)),
+        "max_ms": to_ms(values[-1]) if values else 0.0,
+    }
+
+
+async def drive(client, plan: list[str], ids: list, rng: random.Random, concurrency: int):
+    """Execute `plan` with `concurrency` workers; returns per-op latencies,
+    per-op error counts and wall time."""
+    latencies: dict[str, list[float]] = {name: [] for name in OPERATIONS}
+    errors: dict[str, int] = {name: 0 for name in OPERATIONS}
+    position = iter(plan)
+
+    async def worker():
+        for name in position:
+            started = time.perf_counter()
+            try:
+                status = await OPERATIONS[name](client, ids, rng)
+            except httpx.HTTPError:
+                status = 599
+            latencies[name].append(time.perf_counter() - started)
+            if status >= 400 and status != 404:  # 404: raced with a delete
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    weights = parse_mix(args.mix)
+    mailbox = ensure_mailbox(args.rows, args.seed, args.regenerate)
+    # Writes go to a copy so every run starts from the same mailbox
+    workdir = tempfile.mkdtemp(prefix="email-bench-")
+    database_path = os.path.join(workdir, "app.db")
+    shutil.copyfile(mailbox, database_path)
+    ids = sample_ids(database_path, rng)
+    warmup = rng.choices(list(weights), list(weights.values()), k=args.warmup)
+    plan = rng.choices(list(weights), list(weights.values()), k=args.requests)
+
+    target = (
+        in_process_client(database_path)
+        if args.mode == "inprocess"
+        else http_client(database_path, args.url)
+    )
+    try:
+        async with target as (client, server):
+            await drive(client, warmup, ids, rng, args.concurrency)
+            latencies, errors, elapsed = await drive(client, plan, ids, rng, args.concurrency)
+            server_rss = peak_rss_kb(server.pid) if server else None
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "config": {
+            "mode": args.mode,
+            "rows": args.rows,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "mix": weights,
+            "seed": args.seed,
+            "url": args.url,
+            "env": {
+                key: value for key, value in os.environ.items()
+                if key.startswith(("DATABASE_", "EMAIL_CACHE_", "JSON_", "COMPRESSION_"))
+                and key != "DATABASE_PATH"
+            },
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "total": summarize(all_latencies, sum(errors.values()), elapsed),
+        "operations": {
+            name: summarize(latencies[name], errors[name], elapsed)
+            for name in weights
+        },
+        "peak_rss_kb": {"client": peak_rss_kb(), "server": server_rss},
+    }
+
+
+def print_report(result: dict) -> None:
+    config = result["config"]
+    print(
+        f"\n{config['mode']} | {config['rows']:,} emails | {config['requests']:,} requests"
+        f" | concurrency {config['concurrency']}"
+    )
+    print(f"{'operation':<10} {'count':>7} {'err':>5} {'rps':>9} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = list(result["operations"].items()) + [("total", result["total"])]
+    for name, stats in rows:
+        print(f"{name:<10} {stats['requests']:>7} {stats['errors']:>5} "
+              f"{stats['throughput_rps']:>9} {stats['p50_ms']:>9} "
+              f"{stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+    rss = result["peak_rss_kb"]
+    print(f"peak RSS: client {rss['client']} KiB, server {rss['server']} KiB\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the email API")
+    parser.add_argument("--mode", choices=["inprocess", "http"], default="inprocess")
+    parser.add_argument("--url", help="Benchmark a running server instead of starting one (http mode)")
+    parser.add_argument("--rows", type=int, default=10_000, help="Mailbox size")
+    parser.add_argument("--requests", type=int, default=2_000, help="Measured requests")
+    parser.add_argument("--warmup", type=int, default=200, help="Unmeasured requests first")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted operation mix")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (mailbox and plan)")
+    parser.add_argument("--regenerate", action="store_true", help="Rebuild the mailbox first")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
@@ -0,0 +1,106 @@
+"""
+Body Storage Benchmark
+
+Compares a generated mailbox with bodies inline in `emails` (010 reverted)
+against the same mailbox with bodies compressed in `email_bodies`: file size
+after VACUUM, pages per table, and the latency of list-panel scans read
+through a small page cache. SQLite does not report cache hits to Python, so
+scan latency with a cache smaller than the table stands in for hit rate.
+
+Usage:
+    python -m benchmarks.storage --rows 100000
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.migrator import downgrade_database, migration_status
+from benchmarks.generate import generate_mailbox
+
+BODIES_MIGRATION = "010_move_email_bodies"
+SCAN_CACHE_KB = 2048  # page cache per connection while scanning
+SCAN_REPEATS = 5
+
+# The queries behind GET /emails?fields=summary and a full list page
+SUMMARY_SCAN_SQL = """SELECT emails.id, emails.sender_name, emails.sender_email,
+    emails.sender_avatar, emails.subject, emails.preview, emails.date,
+    emails.is_read, emails.is_archived, emails.attachments != '[]'
+    FROM emails WHERE is_read = 0 ORDER BY date DESC, id DESC"""
+PAGE_SQL = "SELECT * FROM emails ORDER BY date DESC, id DESC LIMIT 50"
+
+
+def inline_copy(path: str, directory: str) -> str:
+    """Copy of the mailbox with 010 and every later migration reverted
+    (bodies back in emails)."""
+    copy = os.path.join(directory, "inline.db")
+    shutil.copy(path, copy)
+    steps = sum(
+        1 for name, state, _ in migration_status(copy)
+        if state != "PENDING" and name >= BODIES_MIGRATION
+    )
+    downgrade_database(copy, steps)
+    return copy
+
+
+def measure(path: str) -> dict:
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    tables = dict(conn.execute(
+        """SELECT name, sum(pgsize) FROM dbstat
+           WHERE name IN ('emails', 'email_bodies', 'emails_fts_content')
+           GROUP BY name"""
+    ).fetchall())
+    conn.close()
+
+    timings = {}
+    for label, sql in (("summary_scan", SUMMARY_SCAN_SQL), ("first_page", PAGE_SQL)):
+        samples = []
+        for _ in range(SCAN_REPEATS):
+            # A new connection starts with an empty page cache
+            conn = sqlite3.connect(path)
+            conn.execute(f"PRAGMA cache_size = -{SCAN_CACHE_KB}")
+            started = time.perf_counter()
+            conn.execute(sql).fetchall()
+            samples.append(time.perf_counter() - started)
+            conn.close()
+        timings[label] = statistics.median(samples) * 1000
+    return {"file_bytes": os.path.getsize(path), "tables": tables, "ms": timings}
+
+
+def print_report(inline: dict, compressed: dict) -> None:
+    def row(label: str, before: float, after: float, unit: str) -> None:
+        ratio = f"{after / before:.2f}x" if before else "-"
+        print(f"{label:<28}{before:>14,.1f}{after:>14,.1f} {unit:<4}{ratio:>8}")
+
+    print(f"{'':<28}{'inline':>14}{'compressed':>14}")
+    row("database file", inline["file_bytes"] / 1024, compressed["file_bytes"] / 1024, "KiB")
+    for table in ("emails", "email_bodies", "emails_fts_content"):
+        row(
+            f"{table} pages",
+            inline["tables"].get(table, 0) / 1024,
+            compressed["tables"].get(table, 0) / 1024,
+            "KiB",
+        )
+    for label in ("summary_scan", "first_page"):
+        row(f"{label} ({SCAN_CACHE_KB} KiB cache)", inline["ms"][label], compressed["ms"][label], "ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare inline and compressed body storage")
+    parser.add_argument("--rows", type=int, default=100_000, help="Mailbox size")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        compressed_path = os.path.join(directory, "compressed.db")
+        generate_mailbox(compressed_path, args.rows, args.seed)
+        inline_path = inline_copy(compressed_path, directory)
+        print_report(measure(inline_path), measure(compressed_path))
@@ -4,7 +4,6 @@ Version: 001
 Description: Creates the initial items table with id and name columns
 """
 
-import sqlite3
 import sys
 import os
 
@@ -12,29 +11,11 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import DATABASE_PATH
+from app.migrator import run_downgrade, run_upgrade
 
 
-def upgrade():
-    """Apply the migration."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    # Create migrations tracking table if it doesn't exist
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS _migrations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE,
-            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Check if this migration has already been applied
-    cursor.execute("SELECT 1 FROM _migrations WHERE name = ?", ("001_create_items_table",))
-    if cursor.fetchone():
-        print("Migration 001_create_items_table already applied. Skipping.")
-        conn.close()
-        return
-    
+def apply(cursor, database_path):
+    """Apply the migration (inside the migrator's transaction)."""
     # Create items table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS items (
@@ -42,37 +23,31 @@ def upgrade():
             name TEXT NOT NULL
         )
     """)
-    
-    # Insert some sample data
-    sample_items = [
-        ("Apple",),
-        ("Banana",),
-        ("Cherry",),
-    ]
-    cursor.executemany("INSERT INTO items (name) VALUES (?)", sample_items)
-    
-    # Record this migration
-    cursor.execute("INSERT INTO _migrations (name) VALUES (?)", ("001_create_items_table",))
-    
-    conn.commit()
-    conn.close()
-    print("Migration 001_create_items_table applied successfully.")
 
+    # Insert some sample data (default database only, not mailbox shards)
+    if database_path == DATABASE_PATH:
+        sample_items = [
+            ("Apple",),
+            ("Banana",),
+            ("Cherry",),
+        ]
+        cursor.executemany("INSERT INTO items (name) VALUES (?)", sample_items)
 
-def downgrade():
-    """Revert the migration."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
+
+def revert(cursor):
+    """Revert the migration (inside the migrator's transaction)."""
     # Drop items table
     cursor.execute("DROP TABLE IF EXISTS items")
-    
-    # Remove migration record
-    cursor.execute("DELETE FROM _migrations WHERE name = ?", ("001_create_items_table",))
-    
-    conn.commit()
-    conn.close()
-    print("Migration 001_create_items_table reverted successfully.")
+
+
+def upgrade(database_path=DATABASE_PATH):
+    """Apply the migration."""
+    run_upgrade(__file__, database_path)
+
+
+def downgrade(database_path=DATABASE_PATH):
+    """Revert the migration."""
+    run_downgrade(__file__, database_path)
 
 
 if __name__ == "__main__":
@@ -4,7 +4,6 @@ Version: 002
 Description: Creates the emails table with full email fields and seed data
 """
 
-import sqlite3
 import sys
 import os
 import json
@@ -12,6 +11,7 @@ import json
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import DATABASE_PATH
+from app.migrator import run_downgrade, run_upgrade
 
 MIGRATION_NAME = "002_create_emails_table"
 
@@ -151,25 +151,8 @@ SEED_EMAILS = [
 ]
 
 
-def upgrade():
-    """Apply the migration."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS _migrations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE,
-            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    cursor.execute("SELECT 1 FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
-    if cursor.fetchone():
-        print(f"Migration {MIGRATION_NAME} already applied. Skipping.")
-        conn.close()
-        return
-
+def apply(cursor, database_path):
+    """Apply the migration (inside the migrator's transaction)."""
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS emails (
             id TEXT PRIMARY KEY,
@@ -188,7 +171,9 @@ def upgrade():
         )
     """)
 
-    for email in SEED_EMAILS:
+    # Seed data goes into the default database only, not mailbox shards
+    seed_emails = SEED_EMAILS if database_path == DATABASE_PATH else []
+    for email in seed_emails:
         cursor.execute(
             """INSERT INTO emails
                (id, sender_name, sender_email, sender_avatar,
@@ -204,21 +189,20 @@ def upgrade():
             ),
         )
 
-    cursor.execute("INSERT INTO _migrations (name) VALUES (?)", (MIGRATION_NAME,))
-    conn.commit()
-    conn.close()
-    print(f"Migration {MIGRATION_NAME} applied successfully.")
+
+def revert(cursor):
+    """Revert the migration (inside the migrator's transaction)."""
+    cursor.execute("DROP TABLE IF EXISTS emails")
+
+
+def upgrade(database_path=DATABASE_PATH):
+    """Apply the migration."""
+    run_upgrade(__file__, database_path)
 
 
-def downgrade():
+def downgrade(database_path=DATABASE_PATH):
     """Revert the migration."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute("DROP TABLE IF EXISTS emails")
-    cursor.execute("DELETE FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
-    conn.commit()
-    conn.close()
-    print(f"Migration {MIGRATION_NAME} reverted successfully.")
+    run_downgrade(__file__, database_path)
 
 
 if __name__ == "__main__":
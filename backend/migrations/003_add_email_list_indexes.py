@@ -0,0 +1,59 @@
+"""
+Migration: Add email list indexes
+Version: 003
+Description: Adds composite (filter, date, id) indexes backing keyset pagination of the email list
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import DATABASE_PATH
+from app.migrator import run_downgrade, run_upgrade
+
+MIGRATION_NAME = "003_add_email_list_indexes"
+
+
+def apply(cursor, database_path):
+    """Apply the migration (inside the migrator's transaction)."""
+    # One index per list filter so every page is a bounded range scan
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_emails_date_id ON emails (date, id)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_emails_archived_date_id "
+        "ON emails (is_archived, date, id)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_emails_read_date_id "
+        "ON emails (is_read, date, id)"
+    )
+
+
+def revert(cursor):
+    """Revert the migration (inside the migrator's transaction)."""
+    cursor.execute("DROP INDEX IF EXISTS idx_emails_date_id")
+    cursor.execute("DROP INDEX IF EXISTS idx_emails_archived_date_id")
+    cursor.execute("DROP INDEX IF EXISTS idx_emails_read_date_id")
+
+
+def upgrade(database_path=DATABASE_PATH):
+    """Apply the migration."""
+    run_upgrade(__file__, database_path)
+
+
+def downgrade(database_path=DATABASE_PATH):
+    """Revert the migration."""
+    run_downgrade(__file__, database_path)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument("action", choices=["upgrade", "downgrade"])
+    args = parser.parse_args()
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
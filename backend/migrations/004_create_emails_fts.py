@@ -0,0 +1,104 @@
+"""
+Migration: Create emails full-text index
+Version: 004
+Description: Creates the emails_fts FTS5 table over subject, body, sender and
+             attachment filenames, kept in sync with emails by triggers.
+             Index rows share their rowid with the matching emails row.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import DATABASE_PATH
+from app.migrator import run_downgrade, run_upgrade
+
+MIGRATION_NAME = "004_create_emails_fts"
+
+# Space-separated attachment filenames of an emails row (NEW or OLD)
+ATTACHMENT_NAMES_SQL = (
+    "(SELECT group_concat(json_extract(value, '$.filename'), ' ') "
+    "FROM json_each({row}.attachments))"
+)
+
+INSERT_FTS_SQL = """
+    INSERT INTO emails_fts
+        (rowid, subject, body, sender_name, sender_email, attachment_names)
+    VALUES
+        (new.rowid, new.subject, new.body, new.sender_name, new.sender_email,
+         {attachment_names});
+""".format(attachment_names=ATTACHMENT_NAMES_SQL.format(row="new"))
+
+
+def apply(cursor, database_path):
+    """Apply the migration (inside the migrator's transaction)."""
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+            subject,
+            body,
+            sender_name,
+            sender_email,
+            attachment_names,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """)
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS emails_fts_insert AFTER INSERT ON emails
+        BEGIN
+            {INSERT_FTS_SQL}
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS emails_fts_delete AFTER DELETE ON emails
+        BEGIN
+            DELETE FROM emails_fts WHERE rowid = old.rowid;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS emails_fts_update
+        AFTER UPDATE OF subject, body, sender_name, sender_email, attachments ON emails
+        BEGIN
+            DELETE FROM emails_fts WHERE rowid = old.rowid;
+            {INSERT_FTS_SQL}
+        END
+    """)
+
+    # Index existing rows
+    cursor.execute(f"""
+        INSERT INTO emails_fts
+            (rowid, subject, body, sender_name, sender_email, attachment_names)
+        SELECT rowid, subject, body, sender_name, sender_email,
+               {ATTACHMENT_NAMES_SQL.format(row="emails")}
+        FROM emails
+    """)
+
+
+def revert(cursor):
+    """Revert the migration (inside the migrator's transaction)."""
+    cursor.execute("DROP TRIGGER IF EXISTS emails_fts_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS emails_fts_delete")
+    cursor.execute("DROP TRIGGER IF EXISTS emails_fts_update")
+    cursor.execute("DROP TABLE IF EXISTS emails_fts")
+
+
+def upgrade(database_path=DATABASE_PATH):
+    """Apply the migration."""
+    run_upgrade(__file__, database_path)
+
+
+def downgrade(database_path=DATABASE_PATH):
+    """Revert the migration."""
+    run_downgrade(__file__, database_path)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument("action", choices=["upgrade", "downgrade"])
+    args = parser.parse_args()
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
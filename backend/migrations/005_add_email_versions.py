@@ -0,0 +1,82 @@
+"""
+Migration: Add email versions
+Version: 005
+Description: Adds a per-email version column and a single-row mailbox_version
+             counter, both bumped by triggers on every write to emails. They
+             back the ETags of the email API.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import DATABASE_PATH
+from app.migrator import run_downgrade, run_upgrade
+
+MIGRATION_NAME = "005_add_email_versions"
+
+
+def apply(cursor, database_path):
+    """Apply the migration (inside the migrator's transaction)."""
+    cursor.execute(
+        "ALTER TABLE emails ADD COLUMN version INTEGER NOT NULL DEFAULT 1"
+    )
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS mailbox_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO mailbox_version (id, version) VALUES (1, 1)")
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS emails_version_insert AFTER INSERT ON emails
+        BEGIN
+            UPDATE mailbox_version SET version = version + 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS emails_version_delete AFTER DELETE ON emails
+        BEGIN
+            UPDATE mailbox_version SET version = version + 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS emails_version_update AFTER UPDATE ON emails
+        WHEN new.version = old.version
+        BEGIN
+            UPDATE emails SET version = old.version + 1 WHERE rowid = new.rowid;
+            UPDATE mailbox_version SET version = version + 1;
+        END
+    """)
+
+
+def revert(cursor):
+    """Revert the migration (inside the migrator's transaction)."""
+    cursor.execute("DROP TRIGGER IF EXISTS emails_version_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS emails_version_delete")
+    cursor.execute("DROP TRIGGER IF EXISTS emails_version_update")
+    cursor.execute("DROP TABLE IF EXISTS mailbox_version")
+    cursor.execute("ALTER TABLE emails DROP COLUMN version")
+
+
+def upgrade(database_path=DATABASE_PATH):
+    """Apply the migration."""
+    run_upgrade(__file__, database_path)
+
+
+def downgrade(database_path=DATABASE_PATH):
+    """Revert the migration."""
+    run_downgrade(__file__, database_path)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument("action", choices=["upgrade", "downgrade"])
+    args = parser.parse_args()
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
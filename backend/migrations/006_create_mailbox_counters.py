@@ -0,0 +1,94 @@
+"""
+Migration: Create mailbox counters
+Version: 006
+Description: Creates the single-row mailbox_counters table (total, unread,
+             archived) kept up to date by triggers on emails, so badge counts
+             are a primary-key lookup.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import DATABASE_PATH
+from app.migrator import run_downgrade, run_upgrade
+
+MIGRATION_NAME = "006_create_mailbox_counters"
+
+
+def apply(cursor, database_path):
+    """Apply the migration (inside the migrator's transaction)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS mailbox_counters (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total INTEGER NOT NULL DEFAULT 0,
+            unread INTEGER NOT NULL DEFAULT 0,
+            archived INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        INSERT OR REPLACE INTO mailbox_counters (id, total, unread, archived)
+        SELECT 1, COUNT(*),
+               COALESCE(SUM(is_read = 0), 0),
+               COALESCE(SUM(is_archived = 1), 0)
+        FROM emails
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS emails_counters_insert AFTER INSERT ON emails
+        BEGIN
+            UPDATE mailbox_counters SET
+                total = total + 1,
+                unread = unread + (new.is_read = 0),
+                archived = archived + (new.is_archived = 1);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS emails_counters_delete AFTER DELETE ON emails
+        BEGIN
+            UPDATE mailbox_counters SET
+                total = total - 1,
+                unread = unread - (old.is_read = 0),
+                archived = archived - (old.is_archived = 1);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS emails_counters_update
+        AFTER UPDATE OF is_read, is_archived ON emails
+        WHEN new.is_read IS NOT old.is_read OR new.is_archived IS NOT old.is_archived
+        BEGIN
+            UPDATE mailbox_counters SET
+                unread = unread + (new.is_read = 0) - (old.is_read = 0),
+                archived = archived + (new.is_archived = 1) - (old.is_archived = 1);
+        END
+    """)
+
+
+def revert(cursor):
+    """Revert the migration (inside the migrator's transaction)."""
+    cursor.execute("DROP TRIGGER IF EXISTS emails_counters_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS emails_counters_delete")
+    cursor.execute("DROP TRIGGER IF EXISTS emails_counters_update")
+    cursor.execute("DROP TABLE IF EXISTS mailbox_counters")
+
+
+def upgrade(database_path=DATABASE_PATH):
+    """Apply the migration."""
+    run_upgrade(__file__, database_path)
+
+
+def downgrade(database_path=DATABASE_PATH):
+    """Revert the migration."""
+    run_downgrade(__file__, database_path)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument("action", choices=["upgrade", "downgrade"])
+    args = parser.parse_args()
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
@@ -0,0 +1,63 @@
+"""
+Migration: Create attachments table
+Version: 007
+Description: Creates the attachments table holding metadata of uploaded files
+             whose content lives in the content-addressed blob store (by sha256)
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import DATABASE_PATH
+from app.migrator import run_downgrade, run_upgrade
+
+MIGRATION_NAME = "007_create_attachments_table"
+
+
+def apply(cursor, database_path):
+    """Apply the migration (inside the migrator's transaction)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS attachments (
+            id TEXT PRIMARY KEY,
+            email_id TEXT,
+            filename TEXT NOT NULL,
+            content_type TEXT NOT NULL DEFAULT 'application/octet-stream',
+            size INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_attachments_email_id ON attachments (email_id)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_attachments_sha256 ON attachments (sha256)"
+    )
+
+
+def revert(cursor):
+    """Revert the migration (inside the migrator's transaction)."""
+    cursor.execute("DROP TABLE IF EXISTS attachments")
+
+
+def upgrade(database_path=DATABASE_PATH):
+    """Apply the migration."""
+    run_upgrade(__file__, database_path)
+
+
+def downgrade(database_path=DATABASE_PATH):
+    """Revert the migration."""
+    run_downgrade(__file__, database_path)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument("action", choices=["upgrade", "downgrade"])
+    args = parser.parse_args()
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
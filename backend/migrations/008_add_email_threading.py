@@ -0,0 +1,134 @@
+"""
+Migration: Add email threading
+Version: 008
+Description: Adds message_id / in_reply_to / thread_id columns to emails and a
+             threads table (message count, unread count, latest message)
+             maintained by triggers. Existing emails become one thread each.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import DATABASE_PATH
+from app.migrator import run_downgrade, run_upgrade
+
+MIGRATION_NAME = "008_add_email_threading"
+
+
+def apply(cursor, database_path):
+    """Apply the migration (inside the migrator's transaction)."""
+    cursor.execute("ALTER TABLE emails ADD COLUMN message_id TEXT")
+    cursor.execute("ALTER TABLE emails ADD COLUMN in_reply_to TEXT")
+    cursor.execute("ALTER TABLE emails ADD COLUMN thread_id TEXT")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_emails_message_id ON emails (message_id)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_emails_thread_date_id "
+        "ON emails (thread_id, date, id)"
+    )
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS threads (
+            id TEXT PRIMARY KEY,
+            subject TEXT NOT NULL,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            unread_count INTEGER NOT NULL DEFAULT 0,
+            latest_email_id TEXT,
+            latest_date TEXT
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_threads_latest ON threads (latest_date, id)"
+    )
+
+    # Existing emails each start their own thread
+    cursor.execute("UPDATE emails SET thread_id = id WHERE thread_id IS NULL")
+    cursor.execute("""
+        INSERT INTO threads
+            (id, subject, message_count, unread_count, latest_email_id, latest_date)
+        SELECT id, subject, 1, is_read = 0, id, date FROM emails
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS emails_threads_insert AFTER INSERT ON emails
+        WHEN new.thread_id IS NOT NULL
+        BEGIN
+            INSERT INTO threads
+                (id, subject, message_count, unread_count, latest_email_id, latest_date)
+            VALUES
+                (new.thread_id, new.subject, 1, new.is_read = 0, new.id, new.date)
+            ON CONFLICT (id) DO UPDATE SET
+                message_count = message_count + 1,
+                unread_count = unread_count + (new.is_read = 0),
+                latest_email_id = CASE
+                    WHEN (new.date, new.id) > (latest_date, latest_email_id)
+                    THEN new.id ELSE latest_email_id END,
+                latest_date = max(latest_date, new.date);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS emails_threads_delete AFTER DELETE ON emails
+        WHEN old.thread_id IS NOT NULL
+        BEGIN
+            UPDATE threads SET
+                message_count = message_count - 1,
+                unread_count = unread_count - (old.is_read = 0)
+            WHERE id = old.thread_id;
+            UPDATE threads SET
+                latest_email_id = (
+                    SELECT id FROM emails WHERE thread_id = old.thread_id
+                    ORDER BY date DESC, id DESC LIMIT 1),
+                latest_date = (
+                    SELECT date FROM emails WHERE thread_id = old.thread_id
+                    ORDER BY date DESC, id DESC LIMIT 1)
+            WHERE id = old.thread_id AND latest_email_id = old.id;
+            DELETE FROM threads WHERE id = old.thread_id AND message_count <= 0;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS emails_threads_update
+        AFTER UPDATE OF is_read ON emails
+        WHEN new.thread_id IS NOT NULL AND new.is_read IS NOT old.is_read
+        BEGIN
+            UPDATE threads SET
+                unread_count = unread_count + (new.is_read = 0) - (old.is_read = 0)
+            WHERE id = new.thread_id;
+        END
+    """)
+
+
+def revert(cursor):
+    """Revert the migration (inside the migrator's transaction)."""
+    cursor.execute("DROP TRIGGER IF EXISTS emails_threads_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS emails_threads_delete")
+    cursor.execute("DROP TRIGGER IF EXISTS emails_threads_update")
+    cursor.execute("DROP TABLE IF EXISTS threads")
+    cursor.execute("DROP INDEX IF EXISTS idx_emails_message_id")
+    cursor.execute("DROP INDEX IF EXISTS idx_emails_thread_date_id")
+    cursor.execute("ALTER TABLE emails DROP COLUMN thread_id")
+    cursor.execute("ALTER TABLE emails DROP COLUMN in_reply_to")
+    cursor.execute("ALTER TABLE emails DROP COLUMN message_id")
+
+
+def upgrade(database_path=DATABASE_PATH):
+    """Apply the migration."""
+    run_upgrade(__file__, database_path)
+
+
+def downgrade(database_path=DATABASE_PATH):
+    """Revert the migration."""
+    run_downgrade(__file__, database_path)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument("action", choices=["upgrade", "downgrade"])
+    args = parser.parse_args()
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
@@ -0,0 +1,99 @@
+"""
+Migration: Create email change log
+Version: 009
+Description: Creates the append-only email_changes log (one row per insert,
+             update or delete of an email, numbered by a monotonic seq) written
+             by triggers, backing incremental sync. Existing emails are logged
+             as inserts so a sync from seq 0 sees the whole mailbox.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import DATABASE_PATH
+from app.migrator import run_downgrade, run_upgrade
+
+MIGRATION_NAME = "009_create_email_changes"
+
+# Columns a client can change through the API; an update logs which of them
+# actually changed as a JSON array.
+TRACKED_COLUMNS = ("subject", "body", "preview", "is_read", "is_archived")
+
+CHANGED_COLUMNS_SQL = "(SELECT json_group_array(name) FROM ({}))".format(
+    " UNION ALL ".join(
+        f"SELECT '{column}' AS name WHERE new.{column} IS NOT old.{column}"
+        for column in TRACKED_COLUMNS
+    )
+)
+
+
+def apply(cursor, database_path):
+    """Apply the migration (inside the migrator's transaction)."""
+    # AUTOINCREMENT so a seq is never reused, even after pruning the log
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS email_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            email_id TEXT NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete')),
+            fields TEXT,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        INSERT INTO email_changes (email_id, op)
+        SELECT id, 'insert' FROM emails ORDER BY date, id
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS emails_changes_insert AFTER INSERT ON emails
+        BEGIN
+            INSERT INTO email_changes (email_id, op) VALUES (new.id, 'insert');
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS emails_changes_delete AFTER DELETE ON emails
+        BEGIN
+            INSERT INTO email_changes (email_id, op) VALUES (old.id, 'delete');
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS emails_changes_update
+        AFTER UPDATE OF {", ".join(TRACKED_COLUMNS)} ON emails
+        WHEN {" OR ".join(f"new.{c} IS NOT old.{c}" for c in TRACKED_COLUMNS)}
+        BEGIN
+            INSERT INTO email_changes (email_id, op, fields)
+            VALUES (new.id, 'update', {CHANGED_COLUMNS_SQL});
+        END
+    """)
+
+
+def revert(cursor):
+    """Revert the migration (inside the migrator's transaction)."""
+    cursor.execute("DROP TRIGGER IF EXISTS emails_changes_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS emails_changes_delete")
+    cursor.execute("DROP TRIGGER IF EXISTS emails_changes_update")
+    cursor.execute("DROP TABLE IF EXISTS email_changes")
+
+
+def upgrade(database_path=DATABASE_PATH):
+    """Apply the migration."""
+    run_upgrade(__file__, database_path)
+
+
+def downgrade(database_path=DATABASE_PATH):
+    """Revert the migration."""
+    run_downgrade(__file__, database_path)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument("action", choices=["upgrade", "downgrade"])
+    args = parser.parse_args()
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
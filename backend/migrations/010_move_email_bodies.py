@@ -0,0 +1,182 @@
+"""
+Migration: Move email bodies to compressed storage
+Version: 010
+Description: Creates email_bodies, holding each email's body deflate-compressed
+             (see app/bodies.py), and moves existing bodies there in background
+             batches, leaving emails.body empty so list scans read far fewer
+             pages. Triggers stop watching emails.body: body edits are logged
+             and versioned by a trigger on email_bodies instead, and the search
+             index keeps the body it was given on insert.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.bodies import decode_body, move_bodies
+from app.database import DATABASE_PATH
+from app.migrator import run_downgrade, run_upgrade
+
+MIGRATION_NAME = "010_move_email_bodies"
+
+# Online: bodies are moved in batches after apply()
+BACKFILL_TABLE = "emails"
+
+# Columns whose changes bump an email's version: all but body (emptied once
+# by the move) and version itself. Add new emails columns here.
+VERSIONED_COLUMNS = (
+    "id", "sender_name", "sender_email", "sender_avatar", "recipient_name",
+    "recipient_email", "subject", "preview", "date", "is_read", "is_archived",
+    "attachments", "message_id", "in_reply_to", "thread_id",
+)
+
+ATTACHMENT_NAMES_SQL = (
+    "(SELECT group_concat(json_extract(value, '$.filename'), ' ') "
+    "FROM json_each(new.attachments))"
+)
+
+
+def _changes_update_trigger(tracked_columns) -> str:
+    """emails_changes_update of 009 for `tracked_columns`."""
+    changed_columns = "(SELECT json_group_array(name) FROM ({}))".format(
+        " UNION ALL ".join(
+            f"SELECT '{column}' AS name WHERE new.{column} IS NOT old.{column}"
+            for column in tracked_columns
+        )
+    )
+    return f"""
+        CREATE TRIGGER emails_changes_update
+        AFTER UPDATE OF {", ".join(tracked_columns)} ON emails
+        WHEN {" OR ".join(f"new.{c} IS NOT old.{c}" for c in tracked_columns)}
+        BEGIN
+            INSERT INTO email_changes (email_id, op, fields)
+            VALUES (new.id, 'update', {changed_columns});
+        END
+    """
+
+
+def apply(cursor, database_path):
+    """Apply the migration (inside the migrator's transaction)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS email_bodies (
+            email_id TEXT PRIMARY KEY,
+            codec INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+    """)
+
+    # Search index: update the other columns in place, keeping the body
+    cursor.execute("DROP TRIGGER IF EXISTS emails_fts_update")
+    cursor.execute(f"""
+        CREATE TRIGGER emails_fts_update
+        AFTER UPDATE OF subject, sender_name, sender_email, attachments ON emails
+        BEGIN
+            UPDATE emails_fts SET
+                subject = new.subject,
+                sender_name = new.sender_name,
+                sender_email = new.sender_email,
+                attachment_names = {ATTACHMENT_NAMES_SQL}
+            WHERE rowid = new.rowid;
+        END
+    """)
+
+    cursor.execute("DROP TRIGGER IF EXISTS emails_changes_update")
+    cursor.execute(_changes_update_trigger(("subject", "preview", "is_read", "is_archived")))
+
+    cursor.execute("DROP TRIGGER IF EXISTS emails_version_update")
+    cursor.execute(f"""
+        CREATE TRIGGER emails_version_update
+        AFTER UPDATE OF {", ".join(VERSIONED_COLUMNS)} ON emails
+        WHEN new.version = old.version
+        BEGIN
+            UPDATE emails SET version = old.version + 1 WHERE rowid = new.rowid;
+            UPDATE mailbox_version SET version = version + 1;
+        END
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS email_bodies_update
+        AFTER UPDATE OF codec, data ON email_bodies
+        WHEN new.data IS NOT old.data
+        BEGIN
+            UPDATE emails SET version = version + 1 WHERE id = new.email_id;
+            UPDATE mailbox_version SET version = version + 1;
+            INSERT INTO email_changes (email_id, op, fields)
+            VALUES (new.email_id, 'update', '["body"]');
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS emails_bodies_delete AFTER DELETE ON emails
+        BEGIN
+            DELETE FROM email_bodies WHERE email_id = old.id;
+        END
+    """)
+
+
+def backfill(cursor, start, end):
+    """Move the bodies of emails with start < rowid <= end."""
+    move_bodies(cursor, "rowid > ? AND rowid <= ?", (start, end))
+
+
+def revert(cursor):
+    """Revert the migration (inside the migrator's transaction)."""
+    cursor.execute("DROP TRIGGER IF EXISTS email_bodies_update")
+    cursor.execute("DROP TRIGGER IF EXISTS emails_bodies_delete")
+
+    # No trigger watches emails.body at this point
+    cursor.execute("SELECT email_id, codec, data FROM email_bodies")
+    cursor.executemany(
+        "UPDATE emails SET body = ? WHERE id = ?",
+        [(decode_body(codec, data), email_id) for email_id, codec, data in cursor.fetchall()],
+    )
+    cursor.execute("DROP TABLE IF EXISTS email_bodies")
+
+    # Triggers as created by 004, 009 and 005
+    cursor.execute("DROP TRIGGER IF EXISTS emails_fts_update")
+    cursor.execute(f"""
+        CREATE TRIGGER emails_fts_update
+        AFTER UPDATE OF subject, body, sender_name, sender_email, attachments ON emails
+        BEGIN
+            DELETE FROM emails_fts WHERE rowid = old.rowid;
+            INSERT INTO emails_fts
+                (rowid, subject, body, sender_name, sender_email, attachment_names)
+            VALUES
+                (new.rowid, new.subject, new.body, new.sender_name, new.sender_email,
+                 {ATTACHMENT_NAMES_SQL});
+        END
+    """)
+    cursor.execute("DROP TRIGGER IF EXISTS emails_changes_update")
+    cursor.execute(
+        _changes_update_trigger(("subject", "body", "preview", "is_read", "is_archived"))
+    )
+    cursor.execute("DROP TRIGGER IF EXISTS emails_version_update")
+    cursor.execute("""
+        CREATE TRIGGER emails_version_update AFTER UPDATE ON emails
+        WHEN new.version = old.version
+        BEGIN
+            UPDATE emails SET version = old.version + 1 WHERE rowid = new.rowid;
+            UPDATE mailbox_version SET version = version + 1;
+        END
+    """)
+
+
+def upgrade(database_path=DATABASE_PATH):
+    """Apply the migration."""
+    run_upgrade(__file__, database_path)
+
+
+def downgrade(database_path=DATABASE_PATH):
+    """Revert the migration."""
+    run_downgrade(__file__, database_path)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument("action", choices=["upgrade", "downgrade"])
+    args = parser.parse_args()
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
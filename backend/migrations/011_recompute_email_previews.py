@@ -0,0 +1,59 @@
+"""
+Migration: Recompute email previews
+Version: 011
+Description: Regenerates every stored preview with app/previews.py (markup
+             and quoted replies stripped, cut on grapheme boundaries) in
+             background batches. Changed previews are logged and bump email
+             versions like any other update. Reverting keeps the new
+             previews: the old ones are not stored anywhere.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import DATABASE_PATH
+from app.migrator import run_downgrade, run_upgrade
+from app.previews import recompute_previews
+
+MIGRATION_NAME = "011_recompute_email_previews"
+
+# Online: previews are recomputed in batches after apply()
+BACKFILL_TABLE = "emails"
+
+
+def apply(cursor, database_path):
+    """Apply the migration (inside the migrator's transaction)."""
+    # No schema change; the work is done by backfill()
+
+
+def backfill(cursor, start, end):
+    """Recompute the previews of emails with start < rowid <= end."""
+    recompute_previews(cursor, "emails.rowid > ? AND emails.rowid <= ?", (start, end))
+
+
+def revert(cursor):
+    """Revert the migration (inside the migrator's transaction)."""
+    # Nothing to undo
+
+
+def upgrade(database_path=DATABASE_PATH):
+    """Apply the migration."""
+    run_upgrade(__file__, database_path)
+
+
+def downgrade(database_path=DATABASE_PATH):
+    """Revert the migration."""
+    run_downgrade(__file__, database_path)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument("action", choices=["upgrade", "downgrade"])
+    args = parser.parse_args()
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
@@ -0,0 +1,17 @@
+import os
+import tempfile
+import uuid
+
+import pytest
+
+# Point the app at throwaway databases before any app module reads the
+# environment
+_data_dir = tempfile.mkdtemp(prefix="email-client-tests-")
+os.environ["DATABASE_PATH"] = os.path.join(_data_dir, "app.db")
+os.environ["DATABASE_SHARD_DIR"] = os.path.join(_data_dir, "mailboxes")
+
+
+@pytest.fixture
+def mailbox_id() -> str:
+    """A new, empty mailbox shard (migrated on first use)."""
+    return f"test-{uuid.uuid4().hex[:12]}"
@@ -0,0 +1,64 @@
+from app.cache import CachedResponse, ResponseCache
+
+
+def test_invalidate_drops_only_tagged_entries():
+    cache = ResponseCache(max_bytes=1024, ttl=0)
+    cache.put("list:unread", CachedResponse(b"[1]"), ["filter:unread", "mailbox:a"])
+    cache.put("list:all", CachedResponse(b"[1,2]"), ["mailbox:a"])
+    cache.put("email:1", CachedResponse(b"{}"), ["email:1"])
+
+    cache.invalidate("filter:unread", "email:1")
+
+    assert cache.get("list:unread") is None
+    assert cache.get("email:1") is None
+    assert cache.get("list:all") == CachedResponse(b"[1,2]")
+    assert cache.stats()["invalidations"] == 2
+    assert cache.size == len(b"[1,2]")
+
+
+def test_put_is_skipped_after_an_invalidation_since_the_read():
+    cache = ResponseCache(max_bytes=1024, ttl=0)
+    generation = cache.generation
+    cache.invalidate("mailbox:a")  # a write raced the query
+
+    cache.put("list:all", CachedResponse(b"stale"), ["mailbox:a"], generation)
+    assert cache.get("list:all") is None
+
+    cache.put("list:all", CachedResponse(b"fresh"), ["mailbox:a"], cache.generation)
+    assert cache.get("list:all") == CachedResponse(b"fresh")
+
+
+def test_variants_are_sized_and_dropped_with_their_entry():
+    cache = ResponseCache(max_bytes=1024, ttl=0)
+    generation = cache.generation
+    cache.put("email:1", CachedResponse(b"x" * 100, '"1.1"'), ["email:1"], generation)
+    cache.put_variant("email:1", "gzip", CachedResponse(b"z" * 20, '"1.1"'), generation)
+
+    assert cache.get_variant("email:1", "gzip") == CachedResponse(b"z" * 20, '"1.1"')
+    assert cache.size == 120
+
+    cache.invalidate("email:1")
+    assert cache.get_variant("email:1", "gzip") is None
+    assert cache.size == 0
+
+    # A variant encoded from a body read before the invalidation is not kept
+    cache.put("email:1", CachedResponse(b"y" * 100), ["email:1"], cache.generation)
+    cache.put_variant("email:1", "gzip", CachedResponse(b"z" * 20), generation)
+    assert cache.get_variant("email:1", "gzip") is None
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = ResponseCache(max_bytes=30, ttl=0)
+    cache.put("a", CachedResponse(b"a" * 10))
+    cache.put("b", CachedResponse(b"b" * 10), ["t"])
+    cache.put("c", CachedResponse(b"c" * 10))
+    cache.get("a")
+    cache.put("d", CachedResponse(b"d" * 10))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+    # The evicted entry's tags no longer point at it
+    cache.invalidate("t")
+    assert cache.stats()["invalidations"] == 0
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.database import iterate_db
+
+
+def test_iterate_db_yields_every_item_then_closes():
+    closed = []
+
+    def items():
+        try:
+            yield from range(3)
+        finally:
+            closed.append(True)
+
+    async def collect():
+        return [item async for item in iterate_db(items())]
+
+    assert asyncio.run(collect()) == [0, 1, 2]
+    assert closed == [True]
+
+
+def test_iterate_db_closes_generator_when_consumer_stops_early():
+    closed = []
+
+    def items():
+        try:
+            yield from range(100)
+        finally:
+            closed.append(True)
+
+    async def first():
+        batches = iterate_db(items())
+        async for item in batches:
+            await batches.aclose()
+            return item
+
+    assert asyncio.run(first()) == 0
+    assert closed == [True]
+
+
+def test_iterate_db_closes_generator_after_cancelled_step():
+    """A step still running on its worker when the consumer is cancelled is
+    waited for, then the generator is closed (no "generator already
+    executing")."""
+    in_step = threading.Event()
+    release = threading.Event()
+    trace = []
+
+    def items():
+        try:
+            yield 1
+            in_step.set()
+            release.wait(5)
+            trace.append("step finished")
+            yield 2
+        finally:
+            trace.append("closed")
+
+    async def main():
+        async def consume():
+            async for _ in iterate_db(items()):
+                pass
+
+        task = asyncio.create_task(consume())
+        await asyncio.to_thread(in_step.wait, 5)
+        task.cancel()
+        # Finish the in-flight step only after close() has been scheduled
+        asyncio.get_running_loop().call_later(0.05, release.set)
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert trace == ["step finished", "closed"]
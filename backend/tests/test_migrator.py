@@ -0,0 +1,115 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from app import migrator
+from app.migrator import (
+    MigrationError,
+    downgrade_database,
+    migration_status,
+    run_backfills,
+    upgrade_database,
+)
+from app.routes.emails import INSERT_EMAIL_SQL, EmailImport, _import_row
+
+
+def _tables(database_path: str) -> set[str]:
+    conn = sqlite3.connect(database_path)
+    try:
+        rows = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'index', 'trigger') "
+            "AND name NOT LIKE 'sqlite_%'"
+        ).fetchall()
+    finally:
+        conn.close()
+    return {name for (name,) in rows}
+
+
+def _upgrade(database_path: str) -> None:
+    upgrade_database(database_path)
+    for _ in run_backfills(database_path):
+        pass
+
+
+def test_upgrade_downgrade_upgrade_round_trip(tmp_path):
+    database_path = str(tmp_path / "mailbox.db")
+    migrations = migrator.get_migration_files()
+
+    _upgrade(database_path)
+    schema = _tables(database_path)
+    assert {"emails", "email_changes", "attachments"} <= schema
+    assert [status for _, status, _ in migration_status(database_path)] == ["APPLIED"] * len(migrations)
+
+    downgrade_database(database_path)
+    assert _tables(database_path) == {"_migrations"}
+    assert [status for _, status, _ in migration_status(database_path)] == ["PENDING"] * len(migrations)
+
+    _upgrade(database_path)
+    assert _tables(database_path) == schema
+    assert [status for _, status, _ in migration_status(database_path)] == ["APPLIED"] * len(migrations)
+
+
+def test_downgrade_steps_reverts_newest_first(tmp_path):
+    database_path = str(tmp_path / "mailbox.db")
+    _upgrade(database_path)
+
+    downgrade_database(database_path, 2)
+
+    statuses = [status for _, status, _ in migration_status(database_path)]
+    assert statuses[-2:] == ["PENDING", "PENDING"]
+    assert set(statuses[:-2]) == {"APPLIED"}
+
+
+def test_modified_migration_is_refused_until_repaired(tmp_path, monkeypatch):
+    migrations_dir = tmp_path / "migrations"
+    shutil.copytree(migrator.MIGRATIONS_DIR, migrations_dir, ignore=shutil.ignore_patterns("__pycache__"))
+    monkeypatch.setattr(migrator, "MIGRATIONS_DIR", str(migrations_dir))
+    database_path = str(tmp_path / "mailbox.db")
+    upgrade_database(database_path)
+
+    modified = migrator.get_migration_files()[0]
+    with open(modified, "a") as f:
+        f.write("\n# edited after it was applied\n")
+    monkeypatch.setattr(migrator, "_checksums", {})  # checksums are cached per process
+    name = migrator.migration_name(modified)
+    assert (name, "MODIFIED") in [(n, s) for n, s, _ in migration_status(database_path)]
+    with pytest.raises(MigrationError):
+        upgrade_database(database_path)
+
+    migrator.repair_checksums(database_path)
+    upgrade_database(database_path)
+    assert (name, "APPLIED") in [(n, s) for n, s, _ in migration_status(database_path)]
+
+
+def test_backfill_resumes_from_recorded_progress(tmp_path):
+    database_path = str(tmp_path / "mailbox.db")
+    _upgrade(database_path)
+    email = EmailImport(
+        sender={"name": "Jane", "email": "jane@example.com"},
+        recipient={"name": "Bob", "email": "bob@example.com"},
+        subject="Hi",
+        body="Hello",
+    )
+    conn = sqlite3.connect(database_path)
+    with conn:
+        for _ in range(5):
+            conn.execute(INSERT_EMAIL_SQL, _import_row(email, "2024-01-01T00:00:00"))
+        # Rerun the preview backfill from the start
+        conn.execute(
+            "UPDATE _migrations SET status = 'backfilling', progress = NULL "
+            "WHERE name = '011_recompute_email_previews'"
+        )
+    conn.close()
+
+    steps = run_backfills(database_path, batch_size=2)
+    assert next(steps) == ("011_recompute_email_previews", 2)
+    steps.close()  # interrupted after one batch
+    status = {name: (state, detail) for name, state, detail in migration_status(database_path)}
+    state, detail = status["011_recompute_email_previews"]
+    assert state == "BACKFILLING"
+    assert detail.endswith("rowid 2 of 5")
+
+    assert list(run_backfills(database_path, batch_size=2)) == [("011_recompute_email_previews", 4)]
+    status = {name: state for name, state, _ in migration_status(database_path)}
+    assert status["011_recompute_email_previews"] == "APPLIED"
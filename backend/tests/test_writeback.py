@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from app import writeback
+from app.changelog import latest_change_seq
+from app.database import get_db
+from app.events import email_events
+from app.routes.emails import EmailCreate, Person, _create_email
+from app.writeback import FlagWriteBuffer
+
+
+def _create(mailbox_id: str, count: int) -> list[str]:
+    """Create `count` sent (read) emails; returns their ids."""
+    email = EmailCreate(recipient=Person(name="Bob", email="bob@example.com"), subject="Hi", body="Hello")
+    return [_create_email(mailbox_id, email)[0]["id"] for _ in range(count)]
+
+
+def _flags(mailbox_id: str) -> dict[str, tuple[int, int]]:
+    with get_db(mailbox_id) as conn:
+        rows = conn.execute("SELECT id, is_read, is_archived FROM emails").fetchall()
+    return {row["id"]: (row["is_read"], row["is_archived"]) for row in rows}
+
+
+def test_later_updates_win_and_are_written_once(mailbox_id):
+    first, second = _create(mailbox_id, 2)
+    buffer = FlagWriteBuffer()
+    buffer.queue(mailbox_id, first, {"is_read": False})
+    buffer.queue(mailbox_id, first, {"is_archived": True})
+    buffer.queue(mailbox_id, first, {"is_read": True})
+    buffer.queue(mailbox_id, second, {"is_read": False})
+    assert buffer.pending(mailbox_id, first) == {"is_read": True, "is_archived": True}
+
+    asyncio.run(buffer.flush(mailbox_id))
+
+    assert _flags(mailbox_id) == {first: (1, 1), second: (0, 0)}
+    assert buffer.pending(mailbox_id, first) == {}
+    assert buffer.stats() == {"pending": 0, "queued": 4, "flushes": 1, "written": 2}
+
+
+def test_flush_publishes_each_logged_change_in_seq_order(mailbox_id):
+    first, second, third = _create(mailbox_id, 3)
+    buffer = FlagWriteBuffer()
+    buffer.queue(mailbox_id, first, {"is_read": False})
+    buffer.queue(mailbox_id, second, {"is_archived": True})
+    buffer.queue(mailbox_id, third, {"is_read": True})  # already read: logs nothing
+
+    async def flush():
+        subscription = email_events.subscribe(mailbox_id)
+        try:
+            await buffer.flush(mailbox_id)
+            return [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+        finally:
+            email_events.unsubscribe(subscription)
+
+    events = asyncio.run(flush())
+
+    assert [(event.type, event.data) for event in events] == [
+        ("updated", {"ids": [first], "fields": {"is_read": False}}),
+        ("updated", {"ids": [second], "fields": {"is_archived": True}}),
+    ]
+    assert events[0].id < events[1].id
+    with get_db(mailbox_id) as conn:
+        assert events[-1].id == latest_change_seq(conn.cursor())
+
+
+def test_failed_flush_keeps_updates_under_newer_ones(mailbox_id, monkeypatch):
+    (email_id,) = _create(mailbox_id, 1)
+    buffer = FlagWriteBuffer()
+    write_flags = writeback._write_flags
+
+    def fail(mailbox_id, updates):
+        # A request queues a newer value while the failing flush is running
+        buffer.queue(mailbox_id, email_id, {"is_read": True})
+        raise RuntimeError("database is locked")
+
+    buffer.queue(mailbox_id, email_id, {"is_read": False, "is_archived": True})
+    monkeypatch.setattr(writeback, "_write_flags", fail)
+    with pytest.raises(RuntimeError):
+        asyncio.run(buffer.flush(mailbox_id))
+    assert buffer.pending(mailbox_id, email_id) == {"is_read": True, "is_archived": True}
+    assert buffer.stats()["pending"] == 1
+
+    monkeypatch.setattr(writeback, "_write_flags", write_flags)
+    asyncio.run(buffer.flush(mailbox_id))
+    assert _flags(mailbox_id) == {email_id: (1, 1)}
+    assert buffer.stats()["pending"] == 0